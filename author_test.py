@@ -1,4 +1,4 @@
-import json
+from author_parser import parse_authors, parse_author_tuples
 
 # Sample JSON data for testing
 json_data = {
@@ -26,28 +26,53 @@ json_data = {
     ]
 }
 
-def parse_authors(authors_str):
-    authors = authors_str.split('&')
-    parsed_authors = []
-    for author in authors:
-        parts = author.strip().split(',')
-        if len(parts) == 2:
-            surname = parts[0].strip()
-            rest = parts[1].strip().split()
-            forename = rest[0] if len(rest) > 0 else ''
-            initials = ' '.join(rest[1:]) if len(rest) > 1 else ''
-            parsed_authors.append({'SURNAME': surname, 'FORENAME': forename, 'INITIALS': initials})
-    return parsed_authors
+# Expected (SURNAME, FORENAME, INITIALS) tuples for the sample projects
+expected_authors = {
+    "PRJ001": (("Doe", "John", "A."), ("Smith", "Jane", "B."), ("rober", "brew", ""), ("robert", "B.", "")),
+    "PRJ002": (("Brown", "Charlie", "C."), ("White", "Alice", "D.")),
+}
+
+# Each documented author format and what it parses to
+cases = [
+    ("Lloyd-Morris, A.", (("Lloyd-Morris", "A.", ""),)),
+    ("Doe, John A.", (("Doe", "John", "A."),)),
+    ("Silvester, R. J., & Owen, W. J", (("Silvester", "R.", "J."), ("Owen", "W.", "J"))),
+    ("Silvester, R. J.; Owen, W. J.", (("Silvester", "R.", "J."), ("Owen", "W.", "J."))),
+    ("Silvester, R. J. and Owen, W. J.", (("Silvester", "R.", "J."), ("Owen", "W.", "J."))),
+    ("Jones N, Silvester, R J & Hankinson R", (("Jones", "N", ""), ("Silvester", "R", "J"), ("Hankinson", "R", ""))),
+    ("Michael Goulden & Nigel Jones", (("Goulden", "Michael", ""), ("Jones", "Nigel", ""))),
+    ("Engineering Archaeological Services Ltd", (("Engineering Archaeological Services Ltd", "", ""),)),
+    # Persons and corporate authors in one list
+    ("Smith, J. and Cambrian Archaeological Projects", (("Smith", "J.", ""), ("Cambrian Archaeological Projects", "", ""))),
+    ("Owen, W. J. and Cadw", (("Owen", "W.", "J."), ("Cadw", "", ""))),
+    ("J. Smith and Cambrian Archaeological Projects", (("Smith", "J.", ""), ("Cambrian Archaeological Projects", "", ""))),
+    ("Hankinson, R., Cambrian Archaeological Projects", (("Hankinson", "R.", ""), ("Cambrian Archaeological Projects", "", ""))),
+    ("Gwynedd Archaeological Trust and Cadw", (("Gwynedd Archaeological Trust", "", ""), ("Cadw", "", ""))),
+    # A corporate name that contains "and"
+    ("Archaeology and Heritage Services Ltd", (("Archaeology and Heritage Services Ltd", "", ""),)),
+    ("", ()),
+]
 
 def main():
-    # Commented out most of the script to focus on parsing authors
     print("Parsing authors from JSON data...")
+    failures = 0
     for project in json_data['oasisProjDetails']:
         authors_str = project['oasisProjBiblioList'][0]['oasisProjBiblioAuthsList']['name']
         parsed_authors = parse_authors(authors_str)
         print(f"Project Reference: {project['projReference']}")
         for author in parsed_authors:
             print(f"Author: SURNAME={author['SURNAME']}, FORENAME={author['FORENAME']}, INITIALS={author['INITIALS']}")
+        parsed = tuple((author['SURNAME'], author['FORENAME'], author['INITIALS']) for author in parsed_authors)
+        expected = expected_authors[project['projReference']]
+        failures += parsed != expected
+        print(f"{'ok' if parsed == expected else 'FAILED'}: {project['projReference']}")
+
+    print("Parsing each documented author format...")
+    for authors_str, expected in cases:
+        parsed = parse_author_tuples(authors_str)
+        failures += parsed != expected
+        print(f"{'ok' if parsed == expected else 'FAILED'}: {authors_str!r} -> {parsed}")
+    return failures
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,404 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import importlib.util
+
+# Ingest benchmark: generates Archwilio-shaped feeds of any size and runs the step-5 load paths against
+# BenchConnection, an in-process stand-in for Oracle that counts round trips and can emulate network latency.
+#
+#   python benchmark.py --projects 1000 10000 --latency 0.0005 --modes parse-stream rowwise bulk bulk-cached pipeline
+#   python benchmark.py --projects 100000 --modes coords-rowwise coords-batch --boundary wales.geojson
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ['parse-load', 'parse-records', 'parse-stream', 'rowwise', 'bulk', 'bulk-cached', 'pipeline']
+# Coordinate stage only: per-site parsing and boundary checks versus the vectorised batch checker
+COORD_MODES = ['coords-rowwise', 'coords-batch']
+
+def load_ingest_module():
+    # The ingest script has a hyphenated file name, so it is loaded by path rather than imported
+    spec = importlib.util.spec_from_file_location('welsh_trusts_greylit', os.path.join(SCRIPT_DIR, 'welsh-trusts-greylit.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# Feed generation
+
+TRUSTS = ['CPAT', 'DAT', 'GGAT', 'GAT']
+SURNAMES = [
+    'Jones', 'Davies', 'Williams', 'Evans', 'Thomas', 'Roberts', 'Hughes', 'Lewis', 'Morgan', 'Griffiths',
+    'Edwards', 'Owen', 'Price', 'Powell', 'Rees', 'Jenkins', 'Lloyd', 'Pritchard', 'Parry', 'Vaughan',
+    'Hankinson', 'Silvester', 'Jones-Morris', 'Grant', 'Britnell', 'Walters', 'Gwilt', 'Sambrook', 'Murphy', 'Page',
+]
+FORENAMES = ['Richard', 'Nigel', 'Bob', 'Ian', 'Jenny', 'Hubert', 'Fiona', 'Ken', 'Andrew', 'Sian', 'Rhys', 'Nia']
+METHODS = ['HERITAGE ASSESSMENT', 'WATCHING BRIEF', 'EVALUATION', 'EXCAVATION', 'DESK BASED ASSESSMENT', 'GLASTIR HEF REPORT']
+WORDS = (
+    'the site lies within a field enclosure where earlier survey recorded a possible barrow and later '
+    'evaluation trenches revealed ditches pits and post holes of medieval and post medieval date'
+).split()
+
+def load_anchors():
+    # Real site locations and admin areas from the sample feed; generated sites are jittered around them.
+    # Each anchor carries the metres of easting and northing per degree of longitude and latitude there,
+    # so a jittered grid reference still agrees with its jittered lon/lat (see SiteCoordinateChecker).
+    from coordinates import wgs84_to_bng
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        sample = json.load(f)
+    anchors = []
+    for project in sample:
+        for site in project['oasisProjSiteList']:
+            coords = site['oasisProjSiteCoordsList']
+            easting, northing = map(float, coords['geomNgrOut'][6:-1].split(','))
+            long, lat = map(float, coords['geomLlOut'][6:-1].split(','))
+            e, n = wgs84_to_bng([long, long + 0.01, long], [lat, lat, lat + 0.01])
+            jacobian = ((e[1] - e[0]) / 0.01, (e[2] - e[0]) / 0.01, (n[1] - n[0]) / 0.01, (n[2] - n[0]) / 0.01)
+            anchors.append((easting, northing, long, lat, tuple(map(float, jacobian)), project['adminAreasMap']))
+    return anchors
+
+def author_name(rng):
+    # Skewed choice so a few prolific authors recur across many reports, as in the real feed
+    surname = SURNAMES[min(int(rng.expovariate(0.15)), len(SURNAMES) - 1)]
+    if rng.random() < 0.6:
+        return f"{surname}, {rng.choice(FORENAMES)[0]}."
+    return f"{surname}, {rng.choice(FORENAMES)} {rng.choice('ABCDEFGHJK')}."
+
+def generate_project(index, rng, anchors):
+    trust = rng.choice(TRUSTS)
+    reference = f"{trust}{100000 + index}"
+    easting, northing, long, lat, (de_dlong, de_dlat, dn_dlong, dn_dlat), admin_areas = rng.choice(anchors)
+
+    sites = []
+    for _ in range(rng.choices([1, 2, 3, 4, 6], weights=[60, 20, 10, 6, 4])[0]):
+        dlong, dlat = rng.uniform(-0.03, 0.03), rng.uniform(-0.018, 0.018)
+        sites.append({
+            'sitename': f"{rng.choice(WORDS).title()} {rng.choice(['barrow', 'enclosure', 'chapel', 'farmstead', 'mill'])}",
+            'sitecode': f"{trust}{rng.randint(1000, 999999)}",
+            'oasisProjSiteCoordsList': {
+                'vectorType': 'POINT',
+                'geomNgrOut': f"POINT({round(easting + de_dlong * dlong + de_dlat * dlat)},{round(northing + dn_dlong * dlong + dn_dlat * dlat)})",
+                'geomLlOut': f"POINT({long + dlong:.7f},{lat + dlat:.7f})",
+            },
+        })
+
+    biblio = []
+    for _ in range(rng.choices([1, 2, 3], weights=[80, 15, 5])[0]):
+        entry = {
+            'title': f"{sites[0]['sitename']}, {rng.choice(METHODS).title()}",
+            'publisher': f"{trust} Archaeology",
+            'biblioType': 'Report (digital)',
+            'pubdate': str(rng.randint(1985, 2024)),
+            'place': f"{trust} Digital Archive",
+            'oasisProjBiblioAuthsList': {
+                'name': ' & '.join(author_name(rng) for _ in range(rng.choices([1, 2, 3, 4], weights=[50, 30, 15, 5])[0])),
+                'role': 'auths',
+            },
+        }
+        if rng.random() < 0.8:
+            entry['url'] = f"https://walesher1974.org/herumd.php?group={trust}&level=3&docid={rng.randint(300000000, 309999999)}"
+        biblio.append(entry)
+
+    return {
+        'oasisProjDetails': {
+            'projName': f"{sites[0]['sitename']} {rng.choice(METHODS).lower()}",
+            'projReference': reference,
+            'descMethod': rng.choice(METHODS),
+            'descOutcome': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 120))).capitalize() + '.\n',
+            'entryDate': f"{rng.randint(2005, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00",
+            'projUrl': f"https://archwilio.org.uk/arch/query/page.php?watprn={reference}&dbname={trust.lower()}&tbname=event",
+        },
+        'oasisProjSiteList': sites,
+        'oasisProjBiblioList': biblio,
+        'adminAreasMap': dict(admin_areas),
+    }
+
+def generate_feed(count, seed=0):
+    rng = random.Random(seed)
+    anchors = load_anchors()
+    for index in range(count):
+        yield generate_project(index, rng, anchors)
+
+def write_feed(path, count, seed=0):
+    # Written one record at a time so a million-project feed never has to fit in memory
+    with open(path, 'w') as f:
+        f.write('[\n')
+        for index, project in enumerate(generate_feed(count, seed)):
+            if index:
+                f.write(',\n')
+            json.dump(project, f)
+        f.write('\n]\n')
+
+# Database stand-in
+
+class BenchVar:
+    def __init__(self, arraysize=1):
+        self.values = [None] * max(arraysize, 1)
+
+    def getvalue(self, pos=0):
+        return self.values[pos]
+
+class BenchCursor:
+    # Mimics the parts of oracledb.Cursor the ingest uses. Every execute/executemany (and every extra
+    # fetch) counts as a round trip and sleeps for the connection's latency. PERSON rows are mirrored
+    # in memory so that lookups and the person cache behave as they would against a real table.
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 100
+        self.rowcount = 0
+        self._rows = []
+        self._fetched = False
+        self._input_sizes = None
+
+    def _round_trip(self, statement, rows=1):
+        self.connection.round_trips += 1
+        kind = ' '.join(statement.split()[:3]).upper()
+        self.connection.statements[kind] = self.connection.statements.get(kind, 0) + 1
+        self.connection.rows_sent += rows
+        if self.connection.latency:
+            time.sleep(self.connection.latency + rows * self.connection.row_latency)
+
+    def var(self, type, arraysize=1):
+        return BenchVar(arraysize)
+
+    def setinputsizes(self, *args, **kwargs):
+        self._input_sizes = list(args) + list(kwargs.values())
+
+    def _returning_var(self, values):
+        for value in values:
+            if isinstance(value, BenchVar):
+                return value
+        return None
+
+    def execute(self, statement, parameters=None, **kwargs):
+        self._round_trip(statement)
+        self._rows = []
+        self._fetched = False
+        binds = kwargs or (parameters if isinstance(parameters, dict) else {})
+        values = list(binds.values()) if binds else list(parameters or [])
+        text = ' '.join(statement.split()).upper()
+        db = self.connection.database
+
+        if text.startswith('INSERT'):
+            new_id = db.next_id()
+            if text.startswith('INSERT INTO PERSON'):
+                db.persons[(binds.get('surname') or '', binds.get('forename') or '', binds.get('initials') or '')] = new_id
+            elif text.startswith('INSERT INTO ISSUE'):
+                db.issue_seq = new_id
+            returning = self._returning_var(values)
+            if returning is not None:
+                returning.values[0] = [new_id]
+
+        if 'ISSUE_SEQ.CURRVAL' in text:
+            self._rows = [(db.issue_seq,)]
+        elif 'MAX(SOURCE_ID)' in text:
+            self._rows = [(None,)]
+        elif text.startswith('SELECT PERSON_ID FROM PERSON'):
+            key = (binds.get('surname') or '', binds.get('forename') or '', binds.get('initials') or '')
+            self._rows = [(db.persons[key],)] if key in db.persons else []
+        elif text.startswith('SELECT SURNAME, FORENAME, INITIALS, PERSON_ID FROM PERSON'):
+            surnames = set(values) if 'WHERE' in text else None
+            self._rows = [key + (person_id,) for key, person_id in db.persons.items() if surnames is None or key[0] in surnames]
+        self.rowcount = len(self._rows) if text.startswith('SELECT') else 1
+
+    def executemany(self, statement, rows):
+        self._round_trip(statement, len(rows))
+        text = ' '.join(statement.split()).upper()
+        db = self.connection.database
+        returning = self._returning_var(self._input_sizes or [])
+        self._input_sizes = None
+        for i, row in enumerate(rows):
+            new_id = db.next_id()
+            if text.startswith('INSERT INTO PERSON'):
+                db.persons[tuple(value or '' for value in row[:3])] = new_id
+            if returning is not None:
+                returning.values[i] = [new_id]
+        self.rowcount = len(rows)
+
+    def _fetch(self, size):
+        if self._fetched and self._rows:
+            self._round_trip('FETCH')
+        self._fetched = True
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchone(self):
+        rows = self._fetch(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=None):
+        return self._fetch(size or self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(len(self._rows))
+
+    def close(self):
+        pass
+
+class BenchDatabase:
+    def __init__(self):
+        self.persons = {}
+        self.issue_seq = 0
+        self._ids = 0
+
+    def next_id(self):
+        self._ids += 1
+        return self._ids
+
+class BenchConnection:
+    def __init__(self, latency=0.0, row_latency=0.0, database=None):
+        self.latency = latency
+        self.row_latency = row_latency
+        self.database = database or BenchDatabase()
+        self.round_trips = 0
+        self.rows_sent = 0
+        self.statements = {}
+
+    def cursor(self):
+        return BenchCursor(self)
+
+    def commit(self):
+        self.connection_round_trip()
+
+    def connection_round_trip(self):
+        self.round_trips += 1
+        self.statements['COMMIT'] = self.statements.get('COMMIT', 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def rollback(self):
+        self.connection_round_trip()
+
+    def close(self):
+        pass
+
+# Benchmark runs
+
+def open_feed(ingest, feed_path):
+    f = open(feed_path, 'r')
+    return f, ingest.read_projects(ingest.iter_json_array(iter(lambda: f.read(ingest.STREAM_CHUNK_SIZE), '')))
+
+def check_coordinates_rowwise(ingest, batch, boundary):
+    # The per-site path: parse each WKT string and test each point on its own
+    from shapely.geometry import Point
+    from coordinates import WALES_BNG_BOUNDS
+    min_e, min_n, max_e, max_n = WALES_BNG_BOUNDS
+    valid = 0
+    for rows in ingest.transform_batch(batch):
+        for vector_type, easting, northing, lat, long in rows['coordinates']:
+            if boundary is not None:
+                valid += boundary.contains(Point(long, lat))
+            else:
+                valid += min_e <= easting <= max_e and min_n <= northing <= max_n
+    return valid
+
+def run_mode(ingest, mode, feed_path, latency, row_latency, batch_size, trace_memory, boundary=None):
+    connection = BenchConnection(latency, row_latency)
+    cursor = connection.cursor()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    project_count = 0
+
+    if mode == 'parse-load':
+        with open(feed_path, 'r') as f:
+            project_count = len(json.load(f))
+    else:
+        f, projects = open_feed(ingest, feed_path)
+        with f:
+            if mode == 'parse-stream':
+                project_count = sum(1 for _ in projects)
+            elif mode == 'parse-records':
+                # The whole feed held as FeedProject records, for comparison with the raw dicts of parse-load
+                project_count = len(list(projects))
+            elif mode == 'rowwise':
+                project_count = ingest.row_load_projects(cursor, connection, projects, 1, 1)
+                connection.commit()
+            elif mode == 'bulk':
+                project_count, _ = ingest.bulk_load_projects(cursor, connection, projects, 1, 1, batch_size)
+            elif mode == 'bulk-cached':
+                person_cache = ingest.PersonCache()
+                person_cache.preload(cursor)
+                project_count, _ = ingest.bulk_load_projects(cursor, connection, projects, 1, 1, batch_size, person_cache)
+            elif mode == 'pipeline':
+                person_cache = ingest.PersonCache()
+                person_cache.preload(cursor)
+                project_count, _ = ingest.pipelined_load_projects(cursor, connection, projects, 1, 1, batch_size, person_cache)
+            elif mode == 'coords-rowwise':
+                for batch in ingest.batched(projects, batch_size):
+                    check_coordinates_rowwise(ingest, batch, boundary)
+                    project_count += len(batch)
+            elif mode == 'coords-batch':
+                from coordinates import SiteCoordinateChecker
+                checker = SiteCoordinateChecker(boundary)
+                for batch in ingest.batched(projects, batch_size):
+                    ingest.transform_batch(batch, checker)
+                    project_count += len(batch)
+            else:
+                raise ValueError(f"Unknown benchmark mode: {mode}")
+
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'mode': mode,
+        'projects': project_count,
+        'seconds': round(elapsed, 3),
+        'projects_per_second': round(project_count / elapsed, 1) if elapsed else None,
+        'round_trips': connection.round_trips,
+        'round_trips_per_project': round(connection.round_trips / project_count, 2) if project_count else None,
+        'rows_sent': connection.rows_sent,
+        'peak_memory_mb': round(peak / (1024 * 1024), 2) if peak is not None else None,
+    }
+
+def print_results(results):
+    columns = ['projects', 'mode', 'seconds', 'projects_per_second', 'round_trips', 'round_trips_per_project', 'peak_memory_mb']
+    print(' | '.join(f"{column:>23}" for column in columns))
+    for result in results:
+        print(' | '.join(f"{str(result[column]):>23}" for column in columns))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Welsh trusts ingest against an in-process database stand-in.")
+    parser.add_argument('--projects', type=int, nargs='+', default=[1000], help="feed sizes to generate (e.g. 1000 100000 1000000)")
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES + COORD_MODES)
+    parser.add_argument('--boundary', help="GeoJSON Wales boundary for the coordinate modes (default: grid envelope only)")
+    parser.add_argument('--latency', type=float, default=0.0, help="emulated seconds per database round trip")
+    parser.add_argument('--row-latency', type=float, default=0.0, help="emulated seconds per row sent in an array bind")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help="record peak memory with tracemalloc (slows every mode down)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    ingest = load_ingest_module()
+    # Per-row log lines would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    boundary = None
+    if args.boundary:
+        from coordinates import load_boundary
+        boundary = load_boundary(args.boundary)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.projects:
+            feed_path = os.path.join(tmp_dir, f"feed_{count}.json")
+            start = time.perf_counter()
+            write_feed(feed_path, count, args.seed)
+            print(f"Generated {count} projects ({os.path.getsize(feed_path) / (1024 * 1024):.1f} MB) in {time.perf_counter() - start:.1f}s")
+            for mode in args.modes:
+                results.append(run_mode(ingest, mode, feed_path, args.latency, args.row_latency, args.batch_size, args.memory, boundary))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+import logging
+import numpy as np
+
+# British National Grid envelope around Wales (min easting, min northing, max easting, max northing).
+# Used on its own when no boundary file is configured.
+WALES_BNG_BOUNDS = (140000, 160000, 365000, 400000)
+
+def parse_points(wkt_points):
+    # Parses a list of "POINT(x,y)" strings into an (n, 2) float array in one pass
+    if not wkt_points:
+        return np.empty((0, 2))
+    text = ','.join(wkt_points).replace('POINT(', '').replace(')', '')
+    values = np.array(text.split(','), dtype=float)
+    if values.size != 2 * len(wkt_points):
+        raise ValueError(f"Expected {len(wkt_points)} POINT(x,y) values, parsed {values.size} numbers")
+    return values.reshape(-1, 2)
+
+def load_boundary(path):
+    # Reads a GeoJSON boundary in WGS84 longitude/latitude (Polygon, MultiPolygon, Feature or
+    # FeatureCollection) and prepares it for repeated point-in-polygon tests
+    import shapely
+    from shapely.geometry import shape
+    from shapely.ops import unary_union
+    try:
+        with open(path, 'r') as f:
+            geojson = json.load(f)
+    except (IOError, ValueError) as e:
+        logging.error(f"Failed to read boundary file {path}: {e}")
+        raise
+    if geojson.get('type') == 'FeatureCollection':
+        geometries = [shape(feature['geometry']) for feature in geojson['features']]
+    elif geojson.get('type') == 'Feature':
+        geometries = [shape(geojson['geometry'])]
+    else:
+        geometries = [shape(geojson)]
+    boundary = unary_union(geometries)
+    shapely.prepare(boundary)
+    logging.info(f"Loaded boundary from {path} ({len(geometries)} geometries).")
+    return boundary
+
+def wgs84_to_bng(lon, lat):
+    # WGS84 longitude/latitude (degrees) to British National Grid easting/northing, vectorised: a Helmert
+    # shift to OSGB36 and the Transverse Mercator projection, as in the Ordnance Survey's "A guide to
+    # coordinate systems in Great Britain". Good to a few metres, enough to tell whether two points agree.
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    a, b = 6378137.0, 6356752.3141
+    e2 = 1 - (b * b) / (a * a)
+    nu = a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    x = nu * np.cos(lat) * np.cos(lon)
+    y = nu * np.cos(lat) * np.sin(lon)
+    z = (1 - e2) * nu * np.sin(lat)
+
+    tx, ty, tz, s = -446.448, 125.157, -542.060, 20.4894e-6
+    rx, ry, rz = np.radians(np.array([-0.1502, -0.2470, -0.8421]) / 3600)
+    x, y, z = (
+        tx + (1 + s) * x - rz * y + ry * z,
+        ty + rz * x + (1 + s) * y - rx * z,
+        tz - ry * x + rx * y + (1 + s) * z,
+    )
+
+    a, b = 6377563.396, 6356256.909
+    e2 = 1 - (b * b) / (a * a)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - e2))
+    for _ in range(5):
+        nu = a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+        lat = np.arctan2(z + e2 * nu * np.sin(lat), p)
+    lon = np.arctan2(y, x)
+
+    f0, lat0, lon0, e0, n0 = 0.9996012717, np.radians(49), np.radians(-2), 400000, -100000
+    n = (a - b) / (a + b)
+    sin, cos, tan = np.sin(lat), np.cos(lat), np.tan(lat)
+    nu = a * f0 / np.sqrt(1 - e2 * sin ** 2)
+    rho = a * f0 * (1 - e2) / (1 - e2 * sin ** 2) ** 1.5
+    eta2 = nu / rho - 1
+    dlat, slat = lat - lat0, lat + lat0
+    m = b * f0 * (
+        (1 + n + 5 / 4 * n ** 2 + 5 / 4 * n ** 3) * dlat
+        - (3 * n + 3 * n ** 2 + 21 / 8 * n ** 3) * np.sin(dlat) * np.cos(slat)
+        + (15 / 8 * n ** 2 + 15 / 8 * n ** 3) * np.sin(2 * dlat) * np.cos(2 * slat)
+        - 35 / 24 * n ** 3 * np.sin(3 * dlat) * np.cos(3 * slat)
+    )
+    dlon = lon - lon0
+    northing = (
+        m + n0
+        + nu / 2 * sin * cos * dlon ** 2
+        + nu / 24 * sin * cos ** 3 * (5 - tan ** 2 + 9 * eta2) * dlon ** 4
+        + nu / 720 * sin * cos ** 5 * (61 - 58 * tan ** 2 + tan ** 4) * dlon ** 6
+    )
+    easting = (
+        e0
+        + nu * cos * dlon
+        + nu / 6 * cos ** 3 * (nu / rho - tan ** 2) * dlon ** 3
+        + nu / 120 * cos ** 5 * (5 - 18 * tan ** 2 + tan ** 4 + 14 * eta2 - 58 * tan ** 2 * eta2) * dlon ** 5
+    )
+    return easting, northing
+
+def in_bounds(x, y, bounds):
+    min_x, min_y, max_x, max_y = bounds
+    return (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+
+# Vectorised site coordinate check. check() parses every geomNgrOut/geomLlOut of a batch at once and
+# returns the parsed arrays with a mask of the points that are safe to load. The grid reference is
+# cross-checked against the point geomLlOut gives: a pair that only agrees with it once easting and
+# northing are exchanged is flagged as swapped, and one that agrees neither way as mismatched. Points
+# that agree are then tested against the boundary (or, without one, the Wales grid envelope, which also
+# takes in a strip of England) and flagged as outside when they fall beyond it.
+DEFAULT_TOLERANCE = 50.0
+
+class SiteCoordinateChecker:
+    def __init__(self, boundary=None, bounds=WALES_BNG_BOUNDS, tolerance=DEFAULT_TOLERANCE):
+        self.boundary = boundary
+        self.bounds = bounds
+        # Metres the grid reference may lie from the projected lon/lat; the projection is good to a few
+        self.tolerance = tolerance
+        self.checked = 0
+        self.swapped = 0
+        self.mismatched = 0
+        self.outside = 0
+
+    def counts(self):
+        return (self.checked, self.swapped, self.mismatched, self.outside)
+
+    def add_counts(self, counts):
+        self.checked, self.swapped, self.mismatched, self.outside = (
+            total + count for total, count in zip(self.counts(), counts)
+        )
+
+    def check(self, ngr_points, ll_points):
+        ngr = parse_points(ngr_points)
+        ll = parse_points(ll_points)
+        easting, northing = ngr[:, 0], ngr[:, 1]
+        projected_easting, projected_northing = wgs84_to_bng(ll[:, 0], ll[:, 1])
+        agrees = np.hypot(easting - projected_easting, northing - projected_northing) <= self.tolerance
+        swapped = ~agrees & (np.hypot(northing - projected_easting, easting - projected_northing) <= self.tolerance)
+        mismatched = ~agrees & ~swapped
+        if self.boundary is not None:
+            import shapely
+            inside = shapely.contains_xy(self.boundary, ll[:, 0], ll[:, 1])
+        else:
+            inside = in_bounds(easting, northing, self.bounds)
+        outside = agrees & ~inside
+        valid = agrees & inside
+        self.checked += len(ngr)
+        self.swapped += int(swapped.sum())
+        self.mismatched += int(mismatched.sum())
+        self.outside += int(outside.sum())
+        return ngr, ll, valid, swapped, mismatched
@@ -0,0 +1,62 @@
+import os
+import json
+import logging
+from feed_records import read_projects, FeedInterner
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# FeedInterner on the sample feed with repeated records: exact and whitespace-only duplicates are
+# dropped, a conflicting copy keeps the first, and repeated sites, URL lists and strings are shared
+# objects rather than equal copies.
+
+def sample_feed():
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        return json.load(f)
+
+def decoded_again(record):
+    # A separately decoded copy, so none of its strings are the same objects as the original's
+    return json.loads(json.dumps(record))
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Deduplicating the sample feed with repeated records...")
+    feed = sample_feed()
+    references = [project['oasisProjDetails']['projReference'] for project in feed]
+    with_site = next(i for i, project in enumerate(feed) if project['oasisProjSiteList'])
+    with_urls = next(i for i, project in enumerate(feed) if any('url' in biblio for biblio in project['oasisProjBiblioList']))
+
+    spaced = decoded_again(feed[1])
+    spaced['oasisProjBiblioList'][0]['title'] = "  " + spaced['oasisProjBiblioList'][0]['title'].replace(" ", "   ") + " "
+    conflicting = decoded_again(feed[2])
+    conflicting['oasisProjBiblioList'][0]['title'] += " (revised)"
+    repeats = [decoded_again(feed[with_site]), spaced, decoded_again(feed[with_urls]), conflicting, decoded_again(feed[with_site])]
+
+    interner = FeedInterner()
+    records = read_projects(feed + repeats, interner=interner)
+    kept = list(interner.dedupe(records))
+    check("every project is kept once, in feed order", [project.reference for project in kept] == references)
+    check("exact and whitespace-only duplicates are counted", interner.duplicates == 4)
+    check("a conflicting copy is dropped and counted", interner.conflicts == 1)
+    check("the first copy of a conflicting project is kept", kept[2].title == feed[2]['oasisProjBiblioList'][0]['title'])
+
+    first, repeat = records[with_site], records[len(feed)]
+    check("a repeated site is one shared FeedSite", bool(first.sites) and all(a is b for a, b in zip(first.sites, repeat.sites)))
+    check("a repeated URL list is one shared tuple", records[with_urls].urls is records[len(feed) + 2].urls)
+    check("recurring strings are interned",
+          first.community is repeat.community and first.county is repeat.county and first.pubdate is repeat.pubdate
+          and all(a.vector_type is b.vector_type for a, b in zip(first.sites, repeat.sites)))
+    distinct_sites = {id(site) for project in records for site in project.sites}
+    site_records = sum(len(project.sites) for project in records)
+    check(f"{site_records} site records share {len(distinct_sites)} FeedSites",
+          interner.site_occurrences == site_records and len(distinct_sites) < site_records)
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import logging
+
+def content_hash(project):
+    # Canonical JSON so key order and whitespace in the feed do not change the hash
+    canonical = json.dumps(project, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# Local record of what previous runs loaded: a content hash per projReference. filter() passes on only
+# new or changed projects; loaded() and mark_loaded() note the ones step 5 actually inserted or updated,
+# and commit() saves the hashes of those alone once the load has succeeded. A changed project that step 4
+# drops as already in the database (update mode off) keeps its old hash, so it is offered again later.
+class DeltaState:
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        self._pending = {}
+        self._loaded = set()
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    state = json.load(f)
+                self.hashes = state.get('hashes', {})
+                logging.info(f"Loaded delta state for {len(self.hashes)} projects.")
+            except (IOError, ValueError) as e:
+                logging.error(f"Failed to read delta state file: {e}")
+                raise
+
+    def filter(self, projects):
+        # Takes FeedProjects read with with_digest=True, so the hashes match those of earlier runs
+        for project in projects:
+            reference = project.reference
+            digest = project.digest
+            known = self.hashes.get(reference)
+            if known is None:
+                self.new += 1
+            elif known != digest:
+                self.changed += 1
+                logging.info(f"Project {reference} has changed since the last run.")
+            else:
+                self.unchanged += 1
+                continue
+            self._pending[reference] = digest
+            yield project
+
+    def loaded(self, projects):
+        # Notes the projects handed to a step-5 loader. A list is noted at once and returned as is; anything
+        # else (a streamed feed) is noted as the loader consumes it.
+        if isinstance(projects, list):
+            self.mark_loaded(project.reference for project in projects)
+            return projects
+        return self._note_loaded(projects)
+
+    def _note_loaded(self, projects):
+        for project in projects:
+            self._loaded.add(project.reference)
+            yield project
+
+    def mark_loaded(self, references):
+        self._loaded.update(references)
+
+    def commit(self):
+        # Records the hashes of the projects filter() passed on that were loaded; the rest stay pending
+        # for a later run
+        recorded = 0
+        for reference, digest in self._pending.items():
+            if reference in self._loaded:
+                self.hashes[reference] = digest
+                recorded += 1
+        skipped = len(self._pending) - recorded
+        self._pending = {}
+        self._loaded = set()
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'hashes': self.hashes}, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logging.error(f"Failed to write delta state file: {e}")
+            raise
+        logging.info(
+            f"Delta state saved: {self.new} new, {self.changed} changed, {self.unchanged} unchanged projects; "
+            f"{recorded} recorded as loaded, {skipped} not loaded and left to a later run."
+        )
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import subprocess
+from delta_state import DeltaState, content_hash
+from feed_records import read_projects
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# DeltaState over successive runs on the sample feed: hashes that do not depend on key order or the
+# process, the new / changed / unchanged split, and what commit() saves for the next run.
+
+def sample_feed():
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        return json.load(f)
+
+def reordered(value):
+    # The same record with every object's keys in reverse order
+    if isinstance(value, dict):
+        return {key: reordered(value[key]) for key in reversed(list(value))}
+    if isinstance(value, list):
+        return [reordered(item) for item in value]
+    return value
+
+def references(projects):
+    return [project.reference for project in projects]
+
+def run(path, feed, load=True):
+    # One run: filter the feed, load what passed (or nothing) and commit. read_projects converts a list
+    # in place, so it gets a copy.
+    state = DeltaState(path)
+    passed = list(state.filter(read_projects(list(feed), with_digest=True)))
+    if load:
+        state.loaded(passed)
+    state.commit()
+    return state, passed
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Filtering the sample feed over successive runs...")
+    feed = sample_feed()
+    all_references = [project['oasisProjDetails']['projReference'] for project in feed]
+    check("key order does not change a hash", all(content_hash(project) == content_hash(reordered(project)) for project in feed))
+    script = "import json, sys; from delta_state import content_hash; print(content_hash(json.load(sys.stdin)))"
+    digests = {
+        subprocess.run(
+            [sys.executable, '-c', script], input=json.dumps(feed[0]), capture_output=True, text=True, cwd=SCRIPT_DIR,
+            env={**os.environ, 'PYTHONHASHSEED': seed}, check=True
+        ).stdout.strip()
+        for seed in ('1', '2')
+    }
+    check("hashes are the same in every process", digests == {content_hash(feed[0])})
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'delta_state.json')
+    try:
+        state, passed = run(path, sample_feed())
+        check("first run passes every project on as new", references(passed) == all_references and state.new == len(feed))
+        with open(path, 'r') as f:
+            saved = json.load(f)['hashes']
+        check("commit saves a hash per loaded project", sorted(saved) == sorted(all_references))
+        check("no temporary file is left", os.listdir(directory) == ['delta_state.json'])
+
+        state, passed = run(path, [reordered(project) for project in sample_feed()])
+        check("an unchanged feed passes nothing on", passed == [] and state.unchanged == len(feed))
+
+        changed = sample_feed()
+        changed[1]['oasisProjBiblioList'][0]['title'] += " (revised)"
+        state, passed = run(path, changed, load=False)
+        check("a changed project is passed on", references(passed) == [all_references[1]] and state.changed == 1)
+        check("the rest are unchanged", state.new == 0 and state.unchanged == len(feed) - 1)
+
+        state, passed = run(path, changed)
+        check("a changed project not loaded is offered again", references(passed) == [all_references[1]])
+        state, passed = run(path, changed)
+        check("once loaded its new hash is kept", passed == [] and state.unchanged == len(feed))
+
+        # A streamed load notes only the projects the loader consumed
+        changed[2]['oasisProjBiblioList'][0]['title'] += " (revised)"
+        changed[3]['oasisProjBiblioList'][0]['title'] += " (revised)"
+        state = DeltaState(path)
+        stream = state.loaded(state.filter(read_projects(iter(changed), with_digest=True)))
+        next(stream)
+        state.commit()
+        state, passed = run(path, changed)
+        check("a streamed load records only what it consumed", references(passed) == [all_references[3]])
+    finally:
+        shutil.rmtree(directory)
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+
+# On-disk cache of feed responses. Each cached URL has a gzip-compressed <key>.json.gz snapshot and a
+# <key>.meta.json file holding the ETag, Last-Modified, encoding and timestamps used for conditional
+# requests and eviction.
+class FeedCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _snapshot_path(self, url):
+        return os.path.join(self.cache_dir, f"{self._key(url)}.json.gz")
+
+    def _meta_path(self, url):
+        return os.path.join(self.cache_dir, f"{self._key(url)}.meta.json")
+
+    def get_meta(self, url):
+        try:
+            with open(self._meta_path(url), 'r') as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if not os.path.exists(self._snapshot_path(url)):
+            return None
+        return meta
+
+    def has_snapshot(self, url):
+        return self.get_meta(url) is not None
+
+    def conditional_headers(self, url):
+        # Validators from the cached response, sent so the server can answer 304 Not Modified
+        meta = self.get_meta(url)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def open_snapshot(self, url):
+        meta = self.get_meta(url)
+        if meta is None:
+            raise FileNotFoundError(f"No cached snapshot for {url}")
+        meta['last_used'] = time.time()
+        self._write_meta(url, meta)
+        logging.info(f"Using cached feed snapshot fetched at {time.ctime(meta['fetched_at'])}")
+        return gzip.open(self._snapshot_path(url), 'rt', encoding=meta.get('encoding') or 'utf-8')
+
+    def mark_validated(self, url):
+        # A 304 confirms the snapshot is still current, so its age restarts from now
+        meta = self.get_meta(url)
+        if meta:
+            meta['fetched_at'] = time.time()
+            self._write_meta(url, meta)
+
+    def store(self, url, chunks, headers, encoding=None):
+        # Passes the response body through while compressing it to a temporary file. The snapshot
+        # only replaces the previous one once every chunk has been consumed.
+        tmp_path = self._snapshot_path(url) + '.tmp'
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, self._snapshot_path(url))
+            now = time.time()
+            self._write_meta(url, {
+                'url': url,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'encoding': encoding,
+                'fetched_at': now,
+                'last_used': now,
+            })
+            completed = True
+            logging.info(f"Stored feed snapshot for {url} ({os.path.getsize(self._snapshot_path(url))} bytes compressed)")
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def save(self, url, content, headers, encoding=None):
+        for _ in self.store(url, [content], headers, encoding):
+            pass
+
+    def _write_meta(self, url, meta):
+        tmp_path = self._meta_path(url) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(url))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.meta.json'):
+                continue
+            key = name[:-len('.meta.json')]
+            meta_path = os.path.join(self.cache_dir, name)
+            snapshot_path = os.path.join(self.cache_dir, f"{key}.json.gz")
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                size = os.path.getsize(snapshot_path)
+            except (IOError, ValueError):
+                meta, size = {}, 0
+            entries.append((meta, size, meta_path, snapshot_path))
+        return entries
+
+    def _remove(self, meta_path, snapshot_path):
+        for path in (meta_path, snapshot_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        # Drops snapshots older than max_age, then the least recently used ones until the cache fits in max_bytes
+        now = time.time()
+        kept = []
+        for meta, size, meta_path, snapshot_path in self._entries():
+            if not meta or now - meta.get('fetched_at', 0) > self.max_age:
+                self._remove(meta_path, snapshot_path)
+                logging.info(f"Evicted expired feed snapshot: {snapshot_path}")
+            else:
+                kept.append((meta, size, meta_path, snapshot_path))
+
+        total = sum(size for _, size, _, _ in kept)
+        for meta, size, meta_path, snapshot_path in sorted(kept, key=lambda entry: entry[0].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            self._remove(meta_path, snapshot_path)
+            total -= size
+            logging.info(f"Evicted feed snapshot to stay under the cache size limit: {snapshot_path}")
@@ -0,0 +1,146 @@
+import sys
+import hashlib
+import logging
+from delta_state import content_hash
+
+# Compact records for feed projects. The feed carries many fields the loader never writes (descMethod,
+# projUrl, projName, the full site and biblio sub-records, ...); a FeedProject keeps only the ones step 5
+# needs, in __slots__ instead of nested dicts, and the string values are interned since the same trust,
+# community and vector type recur across thousands of projects.
+
+class FeedSite:
+    __slots__ = ('sitecode', 'sitename', 'vector_type', 'ngr', 'll', 'coordinates')
+
+    def __init__(self, sitecode, sitename, vector_type, ngr, ll):
+        self.sitecode = sitecode
+        self.sitename = sitename
+        self.vector_type = vector_type
+        self.ngr = ngr
+        self.ll = ll
+        # Parsed (TYPE, EASTING, NORTHING, LAT_Y, LONG_X) row, or False if the point failed the coordinate
+        # check; set by the transform the first time the site is seen, so shared sites are parsed once
+        self.coordinates = None
+
+class FeedProject:
+    __slots__ = (
+        'reference', 'title', 'abstract', 'pubdate', 'authors', 'urls', 'biblio_count',
+        'community', 'district', 'county', 'sites', 'digest',
+    )
+
+    def __init__(self, reference, title, abstract, pubdate, authors, urls, biblio_count,
+                 community, district, county, sites, digest=None):
+        self.reference = reference
+        self.title = title
+        self.abstract = abstract
+        self.pubdate = pubdate
+        # Raw oasisProjBiblioAuthsList.name string of the first biblio entry; see author_parser
+        self.authors = authors
+        self.urls = urls
+        self.biblio_count = biblio_count
+        self.community = community
+        self.district = district
+        self.county = county
+        self.sites = sites
+        # content_hash() of the raw feed record, kept only for the delta filter
+        self.digest = digest
+
+    def __repr__(self):
+        return f"FeedProject({self.reference!r}, {len(self.sites)} sites)"
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def feed_site(site, interner=None):
+    # A site without coordinates only fails if the loader goes on to write its coordinates
+    coords = site.get('oasisProjSiteCoordsList') or {}
+    fields = (site['sitecode'], site['sitename'], intern(coords.get('vectorType')), coords.get('geomNgrOut'), coords.get('geomLlOut'))
+    if interner is not None:
+        return interner.site(fields)
+    return FeedSite(*fields)
+
+def feed_project(project, with_digest=False, interner=None):
+    details = project['oasisProjDetails']
+    biblio_list = project['oasisProjBiblioList']
+    admin_areas = project['adminAreasMap']
+    urls = tuple(intern(biblio['url']) for biblio in biblio_list if 'url' in biblio)
+    return FeedProject(
+        details['projReference'],
+        biblio_list[0]['title'],
+        details['descOutcome'],
+        intern(biblio_list[0]['pubdate']),
+        biblio_list[0]['oasisProjBiblioAuthsList']['name'],
+        urls if interner is None else interner.value(urls),
+        len(biblio_list),
+        intern(admin_areas['Community']),
+        intern(admin_areas['Unitary Authority']),
+        intern(admin_areas['Old County']),
+        tuple(feed_site(site, interner) for site in project['oasisProjSiteList']),
+        content_hash(project) if with_digest else None,
+    )
+
+def read_projects(projects, with_digest=False, interner=None):
+    # Converts decoded feed records to FeedProjects. A list (the non-streaming fetch) is converted in
+    # place so each raw dict is released as soon as its record exists; anything else is converted lazily.
+    if isinstance(projects, list):
+        for i, project in enumerate(projects):
+            projects[i] = feed_project(project, with_digest, interner)
+        return projects
+    return (feed_project(project, with_digest, interner) for project in projects)
+
+def normalise(value):
+    # Whitespace differences do not make two records different
+    if value is None:
+        return ''
+    return ' '.join(str(value).split())
+
+def record_digest(project):
+    # Content address of a FeedProject: its loaded fields and those of its sites, normalised
+    fields = [
+        project.reference, project.title, project.abstract, project.pubdate, project.authors, project.biblio_count,
+        project.community, project.district, project.county, *project.urls,
+    ]
+    for site in project.sites:
+        fields.extend((site.sitecode, site.sitename, site.vector_type, site.ngr, site.ll))
+    return hashlib.blake2b('\x1f'.join(normalise(field) for field in fields).encode('utf-8'), digest_size=16).digest()
+
+# Content-addressed tables for one run. Sites and URL lists that recur across projects are stored once
+# and shared by every project that repeats them, so per-site work such as coordinate parsing is done
+# once per distinct site. dedupe() drops projects whose normalised content was already seen, and later
+# copies of a projReference that arrive with different content.
+class FeedInterner:
+    def __init__(self):
+        self._sites = {}
+        self._values = {}
+        self._digests = {}
+        self.site_occurrences = 0
+        self.duplicates = 0
+        self.conflicts = 0
+
+    def site(self, fields):
+        self.site_occurrences += 1
+        site = self._sites.get(fields)
+        if site is None:
+            site = self._sites[fields] = FeedSite(*fields)
+        return site
+
+    def value(self, value):
+        return self._values.setdefault(value, value)
+
+    def dedupe(self, projects):
+        for project in projects:
+            digest = record_digest(project)
+            known = self._digests.get(project.reference)
+            if known == digest:
+                self.duplicates += 1
+                continue
+            if known is not None:
+                self.conflicts += 1
+                logging.warning(f"Project {project.reference} appears again in the feed with different content; keeping the first copy.")
+                continue
+            self._digests[project.reference] = digest
+            yield project
+        logging.info(
+            f"Dedup: {len(self._digests)} distinct projects, {self.duplicates} exact duplicates and {self.conflicts} "
+            f"conflicting copies dropped; {len(self._sites)} distinct sites in {self.site_occurrences} site records, "
+            f"{len(self._values)} distinct URL lists."
+        )
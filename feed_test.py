@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import importlib.util
+import requests
+from feed_cache import FeedCache
+from sharded_feed import iter_sharded_feed
+from local_feed_server import start_server
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Sharded feed fetches against local_feed_server: shard coverage, retries with backoff, failed shards,
+# cache revalidation and the streamed path, each with and without stream.
+
+def load_ingest_module():
+    # The ingest script has a hyphenated file name, so it is loaded by path rather than imported
+    spec = importlib.util.spec_from_file_location('welsh_trusts_greylit', os.path.join(SCRIPT_DIR, 'welsh-trusts-greylit.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def references(projects):
+    return [project['oasisProjDetails']['projReference'] for project in projects]
+
+def shard_urls(server, of):
+    base = f"http://127.0.0.1:{server.server_address[1]}/oasis/?scope=all"
+    return [f"{base}&shard={shard}&of={of}" for shard in range(of)]
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        expected = sorted(references(json.load(f)))
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Fetching the feed in shards from the local feed server...")
+    for stream in (False, True):
+        mode = "stream" if stream else "whole shards"
+
+        server = start_server()
+        try:
+            urls = shard_urls(server, 3)
+            # Overlapping shards: the whole feed again as a fourth URL
+            projects = list(iter_sharded_feed(urls + [urls[0].split('&')[0]], workers=3, stream=stream))
+            check(f"{mode}: every project once across overlapping shards", sorted(references(projects)) == expected)
+        finally:
+            server.shutdown()
+
+        server = start_server(fail_rate=0.5, seed=1)
+        try:
+            projects = list(iter_sharded_feed(shard_urls(server, 4), workers=2, retries=10, backoff=0.01, stream=stream))
+            check(f"{mode}: 503s are retried until every shard arrives", sorted(references(projects)) == expected)
+            check(f"{mode}: the failed requests were repeated", server.requests > 4)
+        finally:
+            server.shutdown()
+
+        server = start_server(fail_rate=1.0)
+        try:
+            start = time.perf_counter()
+            try:
+                list(iter_sharded_feed(shard_urls(server, 1), retries=2, backoff=0.05, stream=stream))
+                check(f"{mode}: a shard that keeps failing raises", False)
+            except requests.HTTPError:
+                elapsed = time.perf_counter() - start
+                check(f"{mode}: a shard that keeps failing raises after its retries", server.requests == 3)
+                check(f"{mode}: retries back off exponentially (0.05s + 0.1s)", elapsed >= 0.15)
+        finally:
+            server.shutdown()
+
+        server = start_server()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/missing/"
+            try:
+                list(iter_sharded_feed([url], retries=3, backoff=0.01, stream=stream))
+                check(f"{mode}: a 404 shard raises", False)
+            except requests.HTTPError:
+                check(f"{mode}: a 404 shard raises without retries", server.requests == 0)
+        finally:
+            server.shutdown()
+
+        server = start_server()
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = FeedCache(cache_dir)
+            urls = shard_urls(server, 2)
+            first = list(iter_sharded_feed(urls, cache=cache, stream=stream))
+            check(f"{mode}: each shard is cached", all(cache.has_snapshot(url) for url in urls))
+            # The server now answers 304, so the projects come from the cached snapshots
+            second = list(iter_sharded_feed(urls, cache=cache, stream=stream))
+            check(f"{mode}: a revalidated cache serves the same projects", sorted(references(second)) == sorted(references(first)) == expected)
+        finally:
+            server.shutdown()
+            shutil.rmtree(cache_dir)
+
+    ingest = load_ingest_module()
+    server = start_server()
+    try:
+        projects = ingest.connect_to_api(
+            None, False, stream=True, shard_urls=shard_urls(server, 3), fetch_options={'workers': 2}
+        )
+        check("connect_to_api streams sharded feeds lazily", not isinstance(projects, list))
+        check("connect_to_api streams every project", sorted(references(projects)) == expected)
+    finally:
+        server.shutdown()
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
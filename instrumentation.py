@@ -0,0 +1,382 @@
+import os
+import re
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+
+# Opt-in SQL instrumentation. The Instrumented* wrappers sit around python-oracledb connections, pools
+# and cursors and record, per statement, how many calls were made, how long they took (as a latency
+# histogram), how many rows were bound, affected and fetched, and the time spent in commits. The
+# @timed decorator adds call counts and inclusive wall time per load function. Both write into the
+# SqlMetrics registry passed to enable(); while none is enabled @timed costs one global lookup.
+
+# Upper bounds (seconds) of the latency histogram buckets, as in a Prometheus histogram
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_PREFIX = 'greylit'
+
+WHITESPACE_RE = re.compile(r'\s+')
+IN_LIST_RE = re.compile(r'\bIN\s*\(\s*:\w+(?:\s*,\s*:\w+)+\s*\)', re.IGNORECASE)
+
+_metrics = None
+
+def enable(metrics):
+    global _metrics
+    _metrics = metrics
+
+def disable():
+    global _metrics
+    _metrics = None
+
+def statement_label(sql):
+    # Chunked IN lists of any length count as one statement
+    return IN_LIST_RE.sub('IN (:n, ...)', WHITESPACE_RE.sub(' ', sql).strip())
+
+def timed(func):
+    name = func.__name__
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            metrics = _metrics
+            if metrics is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.record_function(name, time.perf_counter() - start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _metrics
+        if metrics is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.record_function(name, time.perf_counter() - start)
+    return wrapper
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class SqlMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = {}
+        self.functions = {}
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.projects = None
+
+    def _statement(self, label):
+        entry = self.statements.get(label)
+        if entry is None:
+            entry = self.statements[label] = {
+                'execute': 0, 'executemany': 0, 'fetch': 0, 'seconds': 0.0, 'fetch_seconds': 0.0,
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                'rows_bound': 0, 'rows_affected': 0, 'rows_fetched': 0,
+            }
+        return entry
+
+    def record(self, label, call, seconds, rows_bound=0, rows_affected=0):
+        with self._lock:
+            entry = self._statement(label)
+            entry[call] += 1
+            entry['seconds'] += seconds
+            entry['buckets'][next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))] += 1
+            entry['rows_bound'] += rows_bound
+            entry['rows_affected'] += rows_affected
+
+    def record_fetch(self, label, seconds, rows):
+        with self._lock:
+            entry = self._statement(label)
+            entry['fetch'] += 1
+            entry['fetch_seconds'] += seconds
+            entry['rows_fetched'] += rows
+
+    def record_function(self, name, seconds):
+        with self._lock:
+            entry = self.functions.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+    def record_commit(self, seconds):
+        with self._lock:
+            self.commits += 1
+            self.commit_seconds += seconds
+
+    @property
+    def round_trips(self):
+        # execute, executemany and commit each cost one round trip; fetches are mostly served from
+        # prefetched rows and are reported separately
+        return sum(entry['execute'] + entry['executemany'] for entry in self.statements.values()) + self.commits
+
+    def as_dict(self):
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1]['seconds'], reverse=True)
+            return {
+                'round_trips': self.round_trips,
+                'projects': self.projects,
+                'round_trips_per_project': round(self.round_trips / self.projects, 2) if self.projects else None,
+                'commits': {'count': self.commits, 'seconds': round(self.commit_seconds, 6)},
+                'statements': [
+                    dict(entry, statement=label, seconds=round(entry['seconds'], 6), fetch_seconds=round(entry['fetch_seconds'], 6),
+                         buckets=dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], entry['buckets'])))
+                    for label, entry in statements
+                ],
+                'functions': {
+                    name: {'calls': entry['calls'], 'seconds': round(entry['seconds'], 6)}
+                    for name, entry in sorted(self.functions.items(), key=lambda item: item[1]['seconds'], reverse=True)
+                },
+            }
+
+    def prometheus_text(self):
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_sql_calls_total Database calls by statement and call type.",
+            f"# TYPE {p}_sql_calls_total counter",
+        ]
+        with self._lock:
+            statements = list(self.statements.items())
+            functions = list(self.functions.items())
+            for label, entry in statements:
+                for call in ('execute', 'executemany', 'fetch'):
+                    if entry[call]:
+                        lines.append(f'{p}_sql_calls_total{{statement="{_escape_label(label)}",call="{call}"}} {entry[call]}')
+            lines += [
+                f"# HELP {p}_sql_duration_seconds Latency of execute and executemany calls by statement.",
+                f"# TYPE {p}_sql_duration_seconds histogram",
+            ]
+            for label, entry in statements:
+                escaped = _escape_label(label)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), entry['buckets']):
+                    cumulative += count
+                    lines.append(f'{p}_sql_duration_seconds_bucket{{statement="{escaped}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_sql_duration_seconds_sum{{statement="{escaped}"}} {entry["seconds"]:.6f}')
+                lines.append(f'{p}_sql_duration_seconds_count{{statement="{escaped}"}} {cumulative}')
+            for metric, help_text in (('rows_bound', 'Rows bound to executemany calls'), ('rows_affected', 'Rows affected by DML'),
+                                      ('rows_fetched', 'Rows fetched by queries')):
+                lines += [f"# HELP {p}_sql_{metric}_total {help_text} by statement.", f"# TYPE {p}_sql_{metric}_total counter"]
+                lines += [f'{p}_sql_{metric}_total{{statement="{_escape_label(label)}"}} {entry[metric]}' for label, entry in statements]
+            lines += [
+                f"# HELP {p}_sql_round_trips_total Database round trips (execute, executemany and commit).",
+                f"# TYPE {p}_sql_round_trips_total counter",
+                f"{p}_sql_round_trips_total {self.round_trips}",
+                f"# HELP {p}_commits_total Commits.",
+                f"# TYPE {p}_commits_total counter",
+                f"{p}_commits_total {self.commits}",
+                f"# HELP {p}_commit_seconds_total Time spent in commits.",
+                f"# TYPE {p}_commit_seconds_total counter",
+                f"{p}_commit_seconds_total {self.commit_seconds:.6f}",
+                f"# HELP {p}_function_calls_total Calls of instrumented load functions.",
+                f"# TYPE {p}_function_calls_total counter",
+            ]
+            lines += [f'{p}_function_calls_total{{function="{name}"}} {entry["calls"]}' for name, entry in functions]
+            lines += [
+                f"# HELP {p}_function_seconds_total Inclusive wall time of instrumented load functions.",
+                f"# TYPE {p}_function_seconds_total counter",
+            ]
+            lines += [f'{p}_function_seconds_total{{function="{name}"}} {entry["seconds"]:.6f}' for name, entry in functions]
+            if self.projects is not None:
+                lines += [
+                    f"# HELP {p}_projects_loaded Projects loaded by the run.",
+                    f"# TYPE {p}_projects_loaded gauge",
+                    f"{p}_projects_loaded {self.projects}",
+                ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path=None, prometheus_path=None):
+        # Both files are written to a temporary name first, so a textfile collector never reads half a file
+        outputs = []
+        if json_path:
+            outputs.append((json_path, json.dumps(self.as_dict(), indent=2)))
+        if prometheus_path:
+            outputs.append((prometheus_path, self.prometheus_text()))
+        for path, text in outputs:
+            tmp_path = path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+                logging.info(f"SQL metrics written to {path}")
+            except IOError as e:
+                logging.error(f"Failed to write SQL metrics to {path}: {e}")
+                # Never leave a half-written temporary file behind
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        logging.info(f"SQL metrics: {self.round_trips} round trips, {self.commits} commits, {len(self.statements)} distinct statements.")
+
+def _rows_bound(parameters):
+    return parameters if isinstance(parameters, int) else len(parameters)
+
+def _rows_affected(cursor):
+    # rowcount counts fetched rows for queries, so only DML (no description) contributes
+    return (getattr(cursor, 'rowcount', 0) or 0) if getattr(cursor, 'description', None) is None else 0
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_metrics', metrics)
+        object.__setattr__(self, '_label', None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # arraysize, prefetchrows and the like belong to the wrapped cursor
+        setattr(self._cursor, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+    def execute(self, statement, parameters=None, **keyword_parameters):
+        object.__setattr__(self, '_label', statement_label(statement))
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(statement, parameters, **keyword_parameters)
+        finally:
+            self._metrics.record(self._label, 'execute', time.perf_counter() - start, 0, _rows_affected(self._cursor))
+
+    def executemany(self, statement, parameters, **keyword_parameters):
+        object.__setattr__(self, '_label', statement_label(statement))
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(statement, parameters, **keyword_parameters)
+        finally:
+            self._metrics.record(
+                self._label, 'executemany', time.perf_counter() - start, _rows_bound(parameters), _rows_affected(self._cursor)
+            )
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        rows = int(result is not None) if method == 'fetchone' else len(result)
+        self._metrics.record_fetch(self._label, time.perf_counter() - start, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+class AsyncInstrumentedCursor(InstrumentedCursor):
+    async def execute(self, statement, parameters=None, **keyword_parameters):
+        object.__setattr__(self, '_label', statement_label(statement))
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(statement, parameters, **keyword_parameters)
+        finally:
+            self._metrics.record(self._label, 'execute', time.perf_counter() - start, 0, _rows_affected(self._cursor))
+
+    async def executemany(self, statement, parameters, **keyword_parameters):
+        object.__setattr__(self, '_label', statement_label(statement))
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(statement, parameters, **keyword_parameters)
+        finally:
+            self._metrics.record(
+                self._label, 'executemany', time.perf_counter() - start, _rows_bound(parameters), _rows_affected(self._cursor)
+            )
+
+    async def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = await getattr(self._cursor, method)(*args)
+        rows = int(result is not None) if method == 'fetchone' else len(result)
+        self._metrics.record_fetch(self._label, time.perf_counter() - start, rows)
+        return result
+
+    async def fetchone(self):
+        return await self._fetch('fetchone')
+
+    async def fetchmany(self, *args):
+        return await self._fetch('fetchmany', *args)
+
+    async def fetchall(self):
+        return await self._fetch('fetchall')
+
+class InstrumentedConnection:
+    def __init__(self, connection, metrics):
+        self._connection = connection
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._metrics)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._connection.commit()
+        finally:
+            self._metrics.record_commit(time.perf_counter() - start)
+
+class AsyncInstrumentedConnection(InstrumentedConnection):
+    async def __aenter__(self):
+        await self._connection.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._connection.__aexit__(*exc_info)
+
+    def cursor(self, *args, **kwargs):
+        return AsyncInstrumentedCursor(self._connection.cursor(*args, **kwargs), self._metrics)
+
+    async def commit(self):
+        start = time.perf_counter()
+        try:
+            return await self._connection.commit()
+        finally:
+            self._metrics.record_commit(time.perf_counter() - start)
+
+class InstrumentedPool:
+    def __init__(self, pool, metrics):
+        self._pool = pool
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    def acquire(self, *args, **kwargs):
+        return InstrumentedConnection(self._pool.acquire(*args, **kwargs), self._metrics)
+
+class _AsyncAcquire:
+    # AsyncConnectionPool.acquire() is used both as "await pool.acquire()" and "async with pool.acquire()"
+    def __init__(self, acquire, metrics):
+        self._acquire = acquire
+        self._metrics = metrics
+
+    def __await__(self):
+        connection = yield from self._acquire.__await__()
+        return AsyncInstrumentedConnection(connection, self._metrics)
+
+    async def __aenter__(self):
+        return AsyncInstrumentedConnection(await self._acquire.__aenter__(), self._metrics)
+
+    async def __aexit__(self, *exc_info):
+        return await self._acquire.__aexit__(*exc_info)
+
+class AsyncInstrumentedPool(InstrumentedPool):
+    def acquire(self, *args, **kwargs):
+        return _AsyncAcquire(self._pool.acquire(*args, **kwargs), self._metrics)
@@ -0,0 +1,97 @@
+import os
+import shutil
+import logging
+import tempfile
+from types import SimpleNamespace
+from run_journal import RunJournal
+
+# RunJournal across interrupted, resumed and completed runs: which committed projects a --resume run
+# skips, a last line cut short by a crash, and when the journal starts afresh.
+
+def projects(*references):
+    return [SimpleNamespace(reference=reference) for reference in references]
+
+def references(projects):
+    return [project.reference for project in projects]
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Journalling interrupted and resumed runs...")
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'run_journal.jsonl')
+    feed = projects('CPAT1', 'CPAT2', 'DAT1', 'GAT1', 'GGAT1')
+    try:
+        # A run interrupted after two committed batches
+        journal = RunJournal(path)
+        journal.start()
+        journal.record_batch(['CPAT1', 'CPAT2'], [11, 12])
+        journal.record_batch(['DAT1'], [13])
+        journal.close()
+
+        journal = RunJournal(path)
+        check("committed batches are replayed", journal.completed == {'CPAT1', 'CPAT2', 'DAT1'})
+        journal.start(resume=True)
+        remaining = references(journal.skip_completed(feed))
+        check("resume skips the committed projects", remaining == ['GAT1', 'GGAT1'])
+        check("the skipped projects are counted", journal.skipped == 3)
+        journal.record_batch(['GAT1'], [14])
+        journal.close()
+
+        # A crash while the next batch was written leaves half a line
+        with open(path, 'a') as f:
+            f.write('{"event": "batch", "run_id": "x", "references": ["GG')
+        journal = RunJournal(path)
+        check("an incomplete last line is ignored", journal.completed == {'CPAT1', 'CPAT2', 'DAT1', 'GAT1'})
+        journal.start(resume=True)
+        check("only the uncommitted project is loaded again", references(journal.skip_completed(feed)) == ['GGAT1'])
+        journal.close()
+
+        # A fresh run after an unfinished one keeps the earlier batches resumable
+        journal = RunJournal(path)
+        journal.start()
+        check("a run without --resume skips nothing", references(journal.skip_completed(feed)) == references(feed))
+        journal.close()
+        check("its earlier batches stay in the journal", RunJournal(path).completed == {'CPAT1', 'CPAT2', 'DAT1', 'GAT1'})
+
+        # A crash just before a line's newline keeps the line, and the next run starts a new one
+        with open(path, 'a') as f:
+            f.write('{"event": "batch", "run_id": "x", "references": ["GGAT1"], "issue_ids": [15]}')
+        journal = RunJournal(path)
+        journal.start()
+        journal.close()
+        check("a last line without its newline still counts", RunJournal(path).completed == {'CPAT1', 'CPAT2', 'DAT1', 'GAT1', 'GGAT1'})
+
+        # A completed run leaves nothing to resume and the next run starts the file afresh
+        journal = RunJournal(path)
+        journal.start(resume=True)
+        journal.finish()
+        journal = RunJournal(path)
+        check("nothing to resume after a completed run", journal.completed == set())
+        journal.start(resume=True)
+        check("a resume after a completed run skips nothing", references(journal.skip_completed(feed)) == references(feed))
+        journal.close()
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        check("the journal starts afresh after a completed run", len(lines) == 1 and '"start"' in lines[0])
+
+        # Only the last line may be incomplete
+        with open(path, 'w') as f:
+            f.write('{"event": "start", "run_id": "x", "resume": false}\n{"event": "batch"\n{"event": "finish", "run_id": "x"}\n')
+        try:
+            RunJournal(path)
+            check("a damaged line before the last raises", False)
+        except ValueError:
+            check("a damaged line before the last raises", True)
+    finally:
+        shutil.rmtree(directory)
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+import json
+import itertools
+
+# Incremental reader for the feed's top-level JSON array, shared by the streaming fetch of a single URL
+# and of feed shards.
+
+# Characters that can continue a number which raw_decode has so far only read a prefix of ("1." or "1.5e")
+NUMBER_CONTINUATION = set('0123456789.eE+-')
+
+def iter_json_array(chunks):
+    # Yields the elements of a top-level JSON array one at a time from an iterable of text chunks,
+    # so only the record being decoded (plus one chunk) is held in memory. The commas and the closing
+    # ']' between elements are checked, so a malformed array raises ValueError instead of being read
+    # as something else.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    # start: before '['; first: after '[' (an element or ']'); element: after ','; separator: after an element
+    state = 'start'
+    for chunk in itertools.chain(chunks, [None]):
+        exhausted = chunk is None
+        if not exhausted:
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if state == 'start':
+                if char != '[':
+                    raise ValueError("Expected '[' at the start of the JSON feed")
+                state = 'first'
+                pos += 1
+                continue
+            if state == 'separator':
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError(f"Expected ',' or ']' after an element of the JSON feed, found {char!r}")
+                state = 'element'
+                pos += 1
+                continue
+            if char == ']' and state == 'first':
+                return
+            if char in ',]':
+                raise ValueError(f"Expected an element of the JSON feed, found {char!r}")
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Element is incomplete, wait for the next chunk
+                if exhausted:
+                    raise
+                break
+            if end >= len(buffer) and not exhausted:
+                # A trailing scalar may continue in the next chunk
+                break
+            if end < len(buffer) and buffer[end] in NUMBER_CONTINUATION and not isinstance(item, (dict, list, str)):
+                # Only part of a number split across chunks has been read
+                if exhausted:
+                    raise ValueError(f"Invalid number in the JSON feed at {buffer[pos:end + 1]!r}")
+                break
+            pos = end
+            state = 'separator'
+            yield item
+    raise ValueError("JSON feed ended before the closing ']'")
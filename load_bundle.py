@@ -0,0 +1,142 @@
+import os
+import csv
+import json
+import hashlib
+import logging
+import datetime
+from staging_tables import STAGING_TABLES, staging_ddl, FAN_OUT_SQL
+
+# Offline load bundle: the staging rows of a whole feed written to one CSV file per GREYLIT_STG_* table,
+# with a SQL*Loader control file for each, the staging DDL, a SQL*Plus script that fans the staged rows
+# out to ISSUE and its child tables, and a manifest of row counts and checksums. Nothing here needs a
+# database connection, so a bundle can be built, diffed and checked locally and loaded with direct-path
+# SQL*Loader later:
+#
+#   sqlplus user/pass@db @staging_tables.sql           (once, if the staging tables do not exist)
+#   sqlldr user/pass@db control=GREYLIT_STG_ISSUE.ctl   (and the other .ctl files)
+#   sqlplus user/pass@db @fan_out.sql
+
+# Abstracts span several lines, so records end with an ASCII record separator before the newline
+RECORD_TERMINATOR = '\x1e\n'
+
+# SQL*Loader field types for the staging column types
+def loader_field(name, column_type):
+    if column_type == 'CLOB':
+        return f"{name} CHAR(10000000)"
+    if column_type.startswith('VARCHAR2'):
+        return f"{name} CHAR{column_type[len('VARCHAR2'):]}"
+    if column_type.startswith('NUMBER('):
+        return f"{name} INTEGER EXTERNAL"
+    return f"{name} FLOAT EXTERNAL"
+
+def control_file(table):
+    fields = ',\n    '.join(loader_field(name, column_type) for name, column_type in STAGING_TABLES[table])
+    return (
+        "OPTIONS (DIRECT=TRUE)\n"
+        "LOAD DATA\n"
+        "CHARACTERSET UTF8\n"
+        f"INFILE '{table}.csv' \"str X'1e0a'\"\n"
+        "APPEND\n"
+        f"INTO TABLE {table}\n"
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'\n"
+        "TRAILING NULLCOLS\n"
+        f"(\n    {fields}\n)\n"
+    )
+
+def sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+def fan_out_script(load_id, source_name, series_name):
+    return (
+        "-- Fans load bundle " + load_id + " out from the staging tables; load the .ctl files first\n"
+        "WHENEVER SQLERROR EXIT FAILURE ROLLBACK\n"
+        "SET SQLBLANKLINES ON\n"
+        "VARIABLE load_id VARCHAR2(64)\n"
+        "VARIABLE issue_ids REFCURSOR\n"
+        f"EXEC :load_id := {sql_literal(load_id)}\n\n"
+        "-- The source and series are found by name, so the ingest's step 3 must have run against this database\n"
+        "UPDATE GREYLIT_STG_ISSUE SET\n"
+        f"    SOURCE_ID = (SELECT SOURCE_ID FROM SOURCE WHERE NAME = {sql_literal(source_name)}),\n"
+        f"    SERIES_ID = (SELECT SERIES_ID FROM SERIES WHERE SERIES_NAME = {sql_literal(series_name)})\n"
+        "WHERE LOAD_ID = :load_id;\n\n"
+        "-- Projects already in the database are dropped, as in step 4\n"
+        "DELETE FROM GREYLIT_STG_ISSUE s WHERE s.LOAD_ID = :load_id AND EXISTS (\n"
+        "    SELECT 1 FROM RESOURCE_DC_IDENTIFIER d WHERE d.TYPE = 'Project Number' AND d.DESCRIPTION = s.REFERENCE\n"
+        ");\n"
+        f"{FAN_OUT_SQL.strip()}\n"
+        "/\n"
+        "PRINT issue_ids\n"
+        "COMMIT;\n"
+        "EXIT\n"
+    )
+
+class LoadBundle:
+    def __init__(self, directory, load_id):
+        self.directory = directory
+        self.load_id = load_id
+        self.projects = 0
+        self.row_counts = {table: 0 for table in STAGING_TABLES}
+        self._files = {}
+        self._writers = {}
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for table in STAGING_TABLES:
+                f = open(os.path.join(directory, f"{table}.csv"), 'w', newline='', encoding='utf-8')
+                self._files[table] = f
+                self._writers[table] = csv.writer(f, lineterminator=RECORD_TERMINATOR)
+        except IOError as e:
+            logging.error(f"Failed to create load bundle in {directory}: {e}")
+            self._close_files()
+            raise
+
+    def write(self, table_rows, project_count):
+        # Appends the staging rows of one batch (see staging_tables.staging_rows)
+        for table, rows in table_rows.items():
+            self._writers[table].writerows(rows)
+            self.row_counts[table] += len(rows)
+        self.projects += project_count
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def _write_text(self, name, text):
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _checksum(self, name):
+        digest = hashlib.sha256()
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def finish(self, source_name, series_name):
+        # Writes the control files, scripts and manifest once every batch is in the CSV files
+        self._close_files()
+        try:
+            for table in STAGING_TABLES:
+                self._write_text(f"{table}.ctl", control_file(table))
+            self._write_text('staging_tables.sql', ''.join(f"{staging_ddl(table)};\n" for table in STAGING_TABLES) + "EXIT\n")
+            self._write_text('fan_out.sql', fan_out_script(self.load_id, source_name, series_name))
+            manifest = {
+                'load_id': self.load_id,
+                'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'projects': self.projects,
+                'tables': {
+                    table: {'file': f"{table}.csv", 'rows': self.row_counts[table], 'sha256': self._checksum(f"{table}.csv")}
+                    for table in STAGING_TABLES
+                },
+            }
+            self._write_text('manifest.json', json.dumps(manifest, indent=2) + '\n')
+        except IOError as e:
+            logging.error(f"Failed to write load bundle in {self.directory}: {e}")
+            raise
+        logging.info(
+            f"Load bundle {self.load_id} written to {self.directory}: {self.projects} projects, "
+            f"{sum(self.row_counts.values())} rows."
+        )
+
+    def close(self):
+        self._close_files()
@@ -0,0 +1,114 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local HTTP stand-in for the Archwilio feed endpoint, for testing the fetchers without the network.
+# Serves a feed file (the bundled sample by default) at /oasis/ with:
+#   ?scope=all                 every project
+#   ?scope=CPAT                one trust, by projReference prefix
+#   ?scope=all&shard=2&of=4    every 4th project starting at the 3rd, for even shards of one trust
+# Responses carry an ETag and honour If-None-Match and Accept-Encoding: gzip. --fail-rate and --delay
+# inject 503s and latency so that retries and parallel shard downloads can be exercised.
+#
+#   python local_feed_server.py --port 8000 --fail-rate 0.2 --delay 0.5
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def select_projects(projects, query):
+    scope = query.get('scope', ['all'])[0]
+    if scope.lower() != 'all':
+        projects = [p for p in projects if p['oasisProjDetails']['projReference'].upper().startswith(scope.upper())]
+    if 'shard' in query and 'of' in query:
+        shard, of = int(query['shard'][0]), int(query['of'][0])
+        projects = projects[shard::of]
+    return projects
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug("local feed server: " + format, *args)
+
+    def send_body(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if not url.path.rstrip('/').endswith('/oasis'):
+            self.send_body(404, b'{"error": "not found"}')
+            return
+        with server.lock:
+            server.requests += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and server.random.random() < server.fail_rate:
+            self.send_body(503, b'{"error": "temporarily unavailable"}')
+            return
+
+        body = json.dumps(select_projects(server.projects, parse_qs(url.query))).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        headers = {'ETag': etag}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_body(200, body, 'application/json; charset=utf-8', headers)
+
+class FeedServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients closing a keep-alive connection are routine; anything else is printed as usual
+        if isinstance(sys.exc_info()[1], ConnectionResetError):
+            logging.debug(f"local feed server: connection reset by {client_address}")
+            return
+        super().handle_error(request, client_address)
+
+def start_server(feed_path=None, port=0, fail_rate=0.0, delay=0.0, seed=0):
+    # Starts the server on a background thread and returns it; server.server_address[1] is the port
+    # and server.shutdown() stops it
+    with open(feed_path or os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        projects = json.load(f)
+    server = FeedServer(('127.0.0.1', port), FeedRequestHandler)
+    server.projects = projects
+    server.fail_rate = fail_rate
+    server.delay = delay
+    server.random = random.Random(seed)
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="local-feed-server", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Serve a feed file as a local stand-in for the Archwilio endpoint.")
+    parser.add_argument('--feed', help="feed JSON file (default: the bundled sample)")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+    server = start_server(args.feed, args.port, args.fail_rate, args.delay)
+    logging.info(f"Serving {len(server.projects)} projects at http://127.0.0.1:{server.server_address[1]}/oasis/?scope=all")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
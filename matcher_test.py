@@ -0,0 +1,38 @@
+from person_matcher import PersonMatcher
+
+# Existing PERSON rows: ((SURNAME, FORENAME, INITIALS), PERSON_ID)
+persons = [
+    (("Jones", "John", None), 1),
+    (("Jones", "Jane", None), 2),
+    (("Robert", "Brian", None), 3),
+    (("Hughes", "Nigel", "R."), 4),
+    (("Evans", "Rhys", None), 5),
+    (("Evans", "Rhys", None), 6),
+]
+
+# New author keys and the PERSON_ID each should match (None: insert a new person)
+cases = [
+    (("robert", "B.", None), 3),        # near-duplicate of Robert, Brian
+    (("Robert", "Brian", None), 3),
+    (("Jones", "John", None), 1),       # the full name picks one of the two Joneses
+    (("Jones", "J.", None), None),      # John and Jane disagree, so an initial alone matches neither
+    (("Hughes", "N.", "R."), 4),
+    (("Hughes", "Nora", None), None),   # the forenames disagree
+    (("Evans", "R.", None), 5),         # duplicate persons with the same names: the oldest
+]
+
+def main():
+    print("Matching authors against existing persons...")
+    matcher = PersonMatcher()
+    for key, person_id in persons:
+        matcher.add(key, person_id)
+    failures = 0
+    for key, expected in cases:
+        matched = matcher.match(key)
+        status = "ok" if matched == expected else "FAILED"
+        failures += matched != expected
+        print(f"{status}: {key} -> {matched} (expected {expected})")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+import logging
+import threading
+from collections import OrderedDict
+import oracledb
+from person_matcher import PersonMatcher
+
+PRELOAD_SQL = "SELECT SURNAME, FORENAME, INITIALS, PERSON_ID FROM PERSON"
+INSERT_SQL = "INSERT INTO PERSON (SURNAME, FORENAME, INITIALS) VALUES (:1, :2, :3) RETURNING PERSON_ID INTO :4"
+
+def person_key(surname, forename, initials):
+    # Oracle stores empty strings as NULL, so '' and None must map to the same key
+    return (surname or '', forename or '', initials or '')
+
+# In-process identity map of (SURNAME, FORENAME, INITIALS) -> PERSON_ID. With max_entries=None the
+# whole PERSON table is preloaded once and a miss means the person does not exist yet. With a limit,
+# rows are loaded lazily a chunk of surnames at a time and the least recently used keys are evicted.
+# With a PersonMatcher, keys that miss exactly are matched against near-duplicate persons before any
+# new PERSON row is inserted.
+class PersonCache:
+    def __init__(self, max_entries=None, chunk_size=500, fetch_size=5000, matcher=None):
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size
+        self.fetch_size = fetch_size
+        self.matcher = matcher
+        self._ids = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.inserted = 0
+        self.matched = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _remember(self, key, person_id):
+        self._ids[key] = person_id
+        self._ids.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+    def _cache_rows(self, rows, wanted, found):
+        # Caches fetched rows and collects the ids of those in wanted, which eviction cannot take back
+        for surname, forename, initials, person_id in rows:
+            key = person_key(surname, forename, initials)
+            self._remember(key, int(person_id))
+            if self.matcher is not None:
+                self.matcher.add(key, int(person_id))
+            if key in wanted:
+                found[key] = int(person_id)
+
+    def _load_rows(self, cursor, wanted=()):
+        found = {}
+        while True:
+            rows = cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+            self._cache_rows(rows, wanted, found)
+        return found
+
+    async def _load_rows_async(self, cursor, wanted=()):
+        found = {}
+        while True:
+            rows = await cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+            self._cache_rows(rows, wanted, found)
+        return found
+
+    def preload(self, cursor):
+        try:
+            cursor.arraysize = self.fetch_size
+            cursor.execute(PRELOAD_SQL)
+            self._load_rows(cursor)
+            logging.info(f"Preloaded {len(self._ids)} persons into the identity cache.")
+        except oracledb.DatabaseError as e:
+            logging.error(f"Failed to preload persons from the database: {e}")
+            raise
+
+    async def preload_async(self, cursor):
+        try:
+            cursor.arraysize = self.fetch_size
+            await cursor.execute(PRELOAD_SQL)
+            await self._load_rows_async(cursor)
+            logging.info(f"Preloaded {len(self._ids)} persons into the identity cache.")
+        except oracledb.DatabaseError as e:
+            logging.error(f"Failed to preload persons from the database: {e}")
+            raise
+
+    def _surname_queries(self, keys):
+        # Lazy mode: one query per chunk_size surnames, fetching every person who shares one of them
+        surnames = sorted({key[0] for key in keys})
+        for i in range(0, len(surnames), self.chunk_size):
+            chunk = surnames[i:i + self.chunk_size]
+            binds = ', '.join(f':{n + 1}' for n in range(len(chunk)))
+            yield f"{PRELOAD_SQL} WHERE SURNAME IN ({binds})", chunk
+
+    def _load_surnames(self, cursor, keys):
+        found = {}
+        cursor.arraysize = self.fetch_size
+        for sql, binds in self._surname_queries(keys):
+            cursor.execute(sql, binds)
+            found.update(self._load_rows(cursor, set(keys)))
+        return found
+
+    async def _load_surnames_async(self, cursor, keys):
+        found = {}
+        cursor.arraysize = self.fetch_size
+        for sql, binds in self._surname_queries(keys):
+            await cursor.execute(sql, binds)
+            found.update(await self._load_rows_async(cursor, set(keys)))
+        return found
+
+    def _person_id_var(self, cursor, keys):
+        person_id_var = cursor.var(oracledb.NUMBER, arraysize=len(keys))
+        cursor.setinputsizes(None, None, None, person_id_var)
+        return person_id_var
+
+    def _remember_inserted(self, keys, person_id_var):
+        person_ids = [int(person_id_var.getvalue(i)[0]) for i in range(len(keys))]
+        for key, person_id in zip(keys, person_ids):
+            self._remember(key, person_id)
+            if self.matcher is not None:
+                self.matcher.add(key, person_id)
+            logging.debug("Inserted author: %s with ID: %s", key, person_id)
+        self.inserted += len(keys)
+        return dict(zip(keys, person_ids))
+
+    def _insert_persons(self, cursor, keys):
+        person_id_var = self._person_id_var(cursor, keys)
+        cursor.executemany(INSERT_SQL, list(keys))
+        return self._remember_inserted(keys, person_id_var)
+
+    async def _insert_persons_async(self, cursor, keys):
+        person_id_var = self._person_id_var(cursor, keys)
+        await cursor.executemany(INSERT_SQL, list(keys))
+        return self._remember_inserted(keys, person_id_var)
+
+    def _lookup(self, author_lists):
+        # Splits the requested authors into ids already cached and keys still to be found or created
+        keys = [[person_key(a['SURNAME'], a['FORENAME'], a['INITIALS']) for a in authors] for authors in author_lists]
+        wanted = {key for project_keys in keys for key in project_keys}
+        resolved = {}
+        for key in wanted:
+            if key in self._ids:
+                self._ids.move_to_end(key)
+                resolved[key] = self._ids[key]
+        missing = [key for key in wanted if key not in resolved]
+        self.hits += len(resolved)
+        self.misses += len(missing)
+        return keys, resolved, missing
+
+    def _match_near_duplicates(self, missing):
+        # Resolves missing keys that match a known person, and keys that match another missing key
+        # (the most complete spelling is inserted and the rest follow it). Returns the resolved ids,
+        # the keys still to insert and the aliases of keys that follow one of those.
+        resolved = {}
+        to_insert = []
+        aliases = {}
+        pending = PersonMatcher(self.matcher.surname_threshold)
+        for key in sorted(missing, key=lambda key: (-len(key[1]) - len(key[2]), key)):
+            person_id = self.matcher.match(key)
+            if person_id is not None:
+                self._remember(key, person_id)
+                resolved[key] = person_id
+                self.matched += 1
+                logging.debug("Matched author %s to existing person ID: %s", key, person_id)
+                continue
+            leader = pending.match(key)
+            if leader is not None:
+                aliases[key] = to_insert[leader]
+                self.matched += 1
+                continue
+            pending.add(key, len(to_insert))
+            to_insert.append(key)
+        return resolved, to_insert, aliases
+
+    def _resolve_aliases(self, resolved, aliases):
+        for key, leader in aliases.items():
+            resolved[key] = resolved[leader]
+            self._remember(key, resolved[leader])
+            logging.debug("Matched author %s to new person %s with ID: %s", key, leader, resolved[leader])
+
+    def resolve(self, cursor, author_lists):
+        # Maps a list of parsed author lists (one per project) to PERSON_IDs, inserting unknown persons in one batch
+        try:
+            keys, resolved, missing = self._lookup(author_lists)
+            if missing and self.max_entries is not None:
+                resolved.update(self._load_surnames(cursor, missing))
+                missing = [key for key in missing if key not in resolved]
+            aliases = {}
+            if missing and self.matcher is not None:
+                matched, missing, aliases = self._match_near_duplicates(missing)
+                resolved.update(matched)
+            if missing:
+                resolved.update(self._insert_persons(cursor, missing))
+            self._resolve_aliases(resolved, aliases)
+            return [[resolved[key] for key in project_keys] for project_keys in keys]
+        except oracledb.DatabaseError as e:
+            logging.error(f"Failed to resolve authors against the person cache: {e}")
+            raise
+
+    async def resolve_async(self, cursor, author_lists):
+        # Same as resolve, for an oracledb AsyncCursor
+        try:
+            keys, resolved, missing = self._lookup(author_lists)
+            if missing and self.max_entries is not None:
+                resolved.update(await self._load_surnames_async(cursor, missing))
+                missing = [key for key in missing if key not in resolved]
+            aliases = {}
+            if missing and self.matcher is not None:
+                matched, missing, aliases = self._match_near_duplicates(missing)
+                resolved.update(matched)
+            if missing:
+                resolved.update(await self._insert_persons_async(cursor, missing))
+            self._resolve_aliases(resolved, aliases)
+            return [[resolved[key] for key in project_keys] for project_keys in keys]
+        except oracledb.DatabaseError as e:
+            logging.error(f"Failed to resolve authors against the person cache: {e}")
+            raise
+
+# Thread-safe front for a PersonCache shared by parallel workers. Lookups and inserts of new persons
+# run under one lock on a dedicated connection that commits straight away, so no two workers create
+# the same person and every worker session can see the committed PERSON rows it links to.
+class SharedPersonCache:
+    def __init__(self, person_cache, connection):
+        self.person_cache = person_cache
+        self.connection = connection
+        self._cursor = connection.cursor()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # hits, misses, inserted, matched and len() come from the wrapped cache
+        return getattr(self.person_cache, name)
+
+    def __len__(self):
+        return len(self.person_cache)
+
+    def resolve(self, cursor, author_lists):
+        with self._lock:
+            inserted = self.person_cache.inserted
+            person_ids = self.person_cache.resolve(self._cursor, author_lists)
+            if self.person_cache.inserted != inserted:
+                self.connection.commit()
+        return person_ids
+
+    def close(self):
+        self._cursor.close()
+        self.connection.close()
@@ -0,0 +1,164 @@
+import re
+import time
+import random
+import argparse
+import unicodedata
+from difflib import SequenceMatcher
+
+# Near-duplicate matching of PERSON records, e.g. "robert, B." against "Robert, Brian". Persons are
+# grouped into blocks keyed by the Soundex code of the normalised surname plus the first given-name
+# initial, and a new author is only scored against the persons in its own block, so a lookup costs
+# the size of one block rather than the size of the PERSON table.
+
+# Minimum SequenceMatcher ratio between two normalised surnames in the same block
+DEFAULT_SURNAME_THRESHOLD = 0.85
+
+SOUNDEX_CODES = {letter: str(digit) for digit, letters in enumerate(['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'])
+                 for letter in letters}
+NON_LETTER_RE = re.compile(r'[^a-z]')
+GIVEN_SPLIT_RE = re.compile(r'[\s.]+')
+
+def normalise(name):
+    # Case, accents, punctuation and spacing are ignored: "Lloyd-Morris" and "lloyd morris" normalise alike
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return NON_LETTER_RE.sub('', ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold())
+
+def soundex(normalised):
+    if not normalised:
+        return ''
+    code = normalised[0].upper()
+    previous = SOUNDEX_CODES.get(normalised[0], '')
+    for letter in normalised[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit not in ('', '0') and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'hw':
+            # h and w do not separate letters with the same code, vowels do
+            previous = digit
+    return code.ljust(4, '0')
+
+def given_tokens(forename, initials):
+    # "Brian", "R. J." and "R.J." all become lists of lower-case name or initial tokens
+    text = f"{forename or ''} {initials or ''}"
+    tokens = (normalise(token) for token in GIVEN_SPLIT_RE.split(text))
+    return tuple(token for token in tokens if token)
+
+def givens_compatible(a, b):
+    # Each pair of tokens must agree, where an initial agrees with any name starting with that letter.
+    # Extra trailing tokens on one side are allowed ("Robert B" against "Robert B J").
+    agreed = 0
+    for x, y in zip(a, b):
+        if x == y:
+            agreed += 1
+        elif not ((len(x) == 1 or len(y) == 1) and x[0] == y[0]):
+            return None
+    return agreed
+
+def block_key(surname, given):
+    return soundex(surname), given[0][0] if given else ''
+
+# Blocking index over (SURNAME, FORENAME, INITIALS) -> PERSON_ID. add() indexes a person, match()
+# returns the PERSON_ID of the best near-duplicate of a person key, or None when there is none or the
+# best candidates are different people.
+class PersonMatcher:
+    def __init__(self, surname_threshold=DEFAULT_SURNAME_THRESHOLD):
+        self.surname_threshold = surname_threshold
+        # block key -> normalised surname -> [(given tokens, person_id)]
+        self._blocks = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, person_id):
+        surname = normalise(key[0])
+        given = given_tokens(key[1], key[2])
+        if not surname:
+            return
+        block = self._blocks.setdefault(block_key(surname, given), {})
+        block.setdefault(surname, []).append((given, person_id))
+        self._size += 1
+
+    def _surname_scores(self, block, surname):
+        if surname in block:
+            yield 1.0, surname
+        for candidate in block:
+            if candidate == surname:
+                continue
+            matcher = SequenceMatcher(None, surname, candidate)
+            if matcher.real_quick_ratio() >= self.surname_threshold and matcher.quick_ratio() >= self.surname_threshold:
+                ratio = matcher.ratio()
+                if ratio >= self.surname_threshold:
+                    yield ratio, candidate
+
+    def match(self, key):
+        surname = normalise(key[0])
+        given = given_tokens(key[1], key[2])
+        block = self._blocks.get(block_key(surname, given)) if surname else None
+        if not block:
+            return None
+        best_rank = None
+        best = []
+        for surname_score, candidate in self._surname_scores(block, surname):
+            for candidate_given, person_id in block[candidate]:
+                agreed = givens_compatible(given, candidate_given)
+                if agreed is None:
+                    continue
+                # Prefer the closest surname, then the most agreeing full tokens
+                rank = (surname_score, agreed)
+                if best_rank is None or rank > best_rank:
+                    best_rank, best = rank, [(candidate_given, person_id)]
+                elif rank == best_rank:
+                    best.append((candidate_given, person_id))
+        if not best:
+            return None
+        # An initial-only key such as ("Jones", "J.") can fit several persons whose given names disagree
+        # (John and Jane Jones); that is no evidence for either, so no match is made
+        for i, (given_a, _) in enumerate(best):
+            for given_b, _ in best[i + 1:]:
+                if givens_compatible(given_a, given_b) is None:
+                    return None
+        # Among persons that agree with each other, the oldest
+        return min(person_id for _, person_id in best)
+
+# Lookup benchmark: python person_matcher.py --persons 300000 --lookups 20000
+
+def build_persons(count, seed=0):
+    rng = random.Random(seed)
+    syllables = ['ab', 'ber', 'cad', 'dav', 'ev', 'gwy', 'hugh', 'jon', 'lew', 'llo', 'mor', 'owen', 'pry', 'rees', 'sil', 'thom', 'wil', 'yd']
+    forenames = ['Robert', 'Brian', 'Nigel', 'Michael', 'Ian', 'Pat', 'Louise', 'Kate', 'David', 'Rhys', 'Sian', 'Gareth']
+    persons = []
+    for _ in range(count):
+        surname = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).capitalize()
+        forename = rng.choice(forenames)
+        persons.append((surname, forename, rng.choice(['', 'J.', 'A. K.'])))
+    return persons
+
+def variant(person):
+    # A near-duplicate of person: lower-cased surname, forename cut to an initial
+    surname, forename, initials = person
+    return surname.lower(), f"{forename[0]}.", initials
+
+def benchmark(persons, lookups, seed=0):
+    rng = random.Random(seed)
+    people = build_persons(persons, seed)
+    matcher = PersonMatcher()
+    start = time.perf_counter()
+    for person_id, person in enumerate(people, 1):
+        matcher.add(person, person_id)
+    build = time.perf_counter() - start
+    queries = [variant(rng.choice(people)) for _ in range(lookups)]
+    start = time.perf_counter()
+    matched = sum(matcher.match(query) is not None for query in queries)
+    elapsed = time.perf_counter() - start
+    print(f"index: {len(matcher)} persons in {len(matcher._blocks)} blocks, built in {build:.2f}s")
+    print(f"match: {lookups} lookups, {matched} matched, {1000 * elapsed / lookups:.3f} ms per lookup")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate person matching.")
+    parser.add_argument('--persons', type=int, default=300000, help="persons in the index")
+    parser.add_argument('--lookups', type=int, default=20000, help="near-duplicate lookups to time")
+    args = parser.parse_args()
+    benchmark(args.persons, args.lookups)
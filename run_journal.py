@@ -0,0 +1,111 @@
+import os
+import json
+import logging
+import datetime
+import threading
+
+# Append-only JSONL journal of a step-5 load. Each line is one event:
+#   {"event": "start", "run_id": ..., "resume": false}
+#   {"event": "batch", "run_id": ..., "references": [...], "issue_ids": [...]}  written after each commit
+#   {"event": "finish", "run_id": ..., "status": "completed"}
+# Batches journalled since the last completed run are committed projects that a --resume run skips.
+# A new run after a completed one starts the file afresh; after an unfinished one it appends, so
+# every committed batch stays resumable until a run completes.
+class RunJournal:
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self.completed = set()
+        self.batches = 0
+        self.skipped = 0
+        self._finished = True
+        # Byte length of the complete lines, when the last one was cut short and must go before appending
+        self._complete_size = None
+        self._needs_newline = False
+        self._file = None
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                lines = f.readlines()
+        except IOError as e:
+            logging.error(f"Failed to read run journal {self.path}: {e}")
+            raise
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Only the last line can be cut short, by a crash while it was written
+                if number == len(lines):
+                    logging.warning(f"Ignoring incomplete last line of run journal {self.path}.")
+                    self._complete_size = sum(len(complete) for complete in lines[:-1])
+                    break
+                raise
+            # A last line complete but for its newline
+            self._needs_newline = not line.endswith(b'\n')
+            if entry['event'] == 'start':
+                self._finished = False
+            elif entry['event'] == 'batch':
+                self.completed.update(entry['references'])
+            elif entry['event'] == 'finish' and entry.get('status') == 'completed':
+                self.completed = set()
+                self._finished = True
+
+    def _write(self, entry):
+        line = json.dumps({'event': entry.pop('event'), 'run_id': self.run_id, **entry}) + '\n'
+        with self._lock:
+            try:
+                self._file.write(line)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except IOError as e:
+                logging.error(f"Failed to write run journal {self.path}: {e}")
+                raise
+
+    def start(self, resume=False):
+        if resume and self._finished:
+            logging.info("The previous run completed; there is nothing to resume.")
+        elif resume:
+            logging.info(f"Resuming: {len(self.completed)} projects were committed by earlier runs.")
+        elif self.completed:
+            logging.info(f"The previous run did not complete; its {len(self.completed)} committed projects stay in the journal for --resume.")
+        self.run_id = datetime.datetime.now().isoformat(timespec='seconds')
+        try:
+            if not self._finished and self._complete_size is not None:
+                # The next line must not be appended to the cut-short one
+                os.truncate(self.path, self._complete_size)
+            self._file = open(self.path, 'w' if self._finished else 'a')
+            if not self._finished and self._needs_newline:
+                self._file.write('\n')
+        except IOError as e:
+            logging.error(f"Failed to open run journal {self.path}: {e}")
+            raise
+        self._write({'event': 'start', 'resume': resume})
+        if not resume:
+            self.completed = set()
+
+    def skip_completed(self, projects):
+        # Drops projects committed by an earlier run before they reach the step-4 lookup
+        for project in projects:
+            if project.reference in self.completed:
+                self.skipped += 1
+                continue
+            yield project
+
+    def record_batch(self, references, issue_ids):
+        # Called right after the commit that made the batch durable
+        self._write({'event': 'batch', 'references': list(references), 'issue_ids': [int(issue_id) for issue_id in issue_ids]})
+        self.batches += 1
+
+    def finish(self):
+        self._write({'event': 'finish', 'status': 'completed'})
+        self.close()
+        logging.info(f"Run journal: {self.batches} batches committed, {self.skipped} projects skipped as already loaded.")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,48 @@
+import queue
+import atexit
+import logging
+import logging.handlers
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Run-wide logging set-up. At INFO the load paths log one summary line per project or batch; DEBUG adds
+# the per-row trace. With queued logging the calling thread only puts the record on a queue, and a
+# QueueListener thread formats and writes it, so slow terminals and log files stay off the hot path.
+
+_listener = None
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler.prepare() formats the message in the calling thread. Records never leave the process
+    # here, so they are queued as they are and formatted by the listener.
+    def prepare(self, record):
+        return record
+
+def configure_logging(level='INFO', queued=True):
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if not queued or _listener is not None:
+        return
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(queue.SimpleQueue()))
+    _listener = logging.handlers.QueueListener(root.handlers[0].queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    # Flushes every queued record and puts the original handlers back on the root logger
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
@@ -0,0 +1,185 @@
+import json
+import time
+import queue
+import codecs
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from json_stream import iter_json_array
+
+# Parallel download of the feed as several shards (one URL each, e.g. one per trust or per date range)
+# over a shared keep-alive requests.Session. Each shard is fetched with gzip, bounded retries and
+# exponential backoff. Without stream, a shard's projects are passed on as soon as the shard is complete,
+# so the ingest starts on the first shard while the others are still downloading. With stream, each shard
+# is decoded incrementally and its projects pass through a bounded queue, so memory stays bounded by the
+# queue rather than the size of a shard.
+
+# Responses worth retrying; anything else (404, 401, ...) fails the shard at once
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Projects handed over per queue item when streaming, and queue items per worker
+STREAM_BATCH_SIZE = 100
+STREAM_QUEUE_DEPTH = 4
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
+
+def with_retries(url, retries, backoff, attempt_shard):
+    # Runs attempt_shard() until it succeeds, retrying connection errors, timeouts, retryable statuses and
+    # truncated bodies with exponential backoff
+    for attempt in range(retries + 1):
+        try:
+            return attempt_shard(attempt < retries)
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ValueError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if attempt >= retries or (status is not None and status not in RETRY_STATUSES):
+                logging.error(f"Failed to fetch feed shard {url}: {e}")
+                raise
+            delay = backoff * 2 ** attempt
+            logging.warning(f"Fetching feed shard {url} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def get_shard(session, url, timeout, cache, retry_status, stream=False):
+    headers = cache.conditional_headers(url) if cache else {}
+    response = session.get(url, headers=headers, timeout=timeout, stream=stream)
+    if response.status_code in RETRY_STATUSES and retry_status:
+        response.close()
+        raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+    response.raise_for_status()
+    return response
+
+def fetch_shard(session, url, retries=3, backoff=0.5, timeout=60, cache=None):
+    # Returns the decoded JSON array of one shard, revalidating a cached snapshot when there is one
+    def attempt_shard(retry_status):
+        response = get_shard(session, url, timeout, cache, retry_status)
+        if response.status_code == 304:
+            cache.mark_validated(url)
+            with cache.open_snapshot(url) as f:
+                return json.load(f)
+        projects = response.json()
+        if cache:
+            cache.save(url, response.content, response.headers, response.encoding)
+        return projects
+    return with_retries(url, retries, backoff, attempt_shard)
+
+def stream_shard(session, url, emit, retries=3, backoff=0.5, timeout=60, cache=None, chunk_size=STREAM_CHUNK_SIZE):
+    # Decodes one shard incrementally and passes its projects to emit() in lists of STREAM_BATCH_SIZE.
+    # A retry starts the shard again from the top; the projects emitted before the failure come round
+    # again and are dropped by iter_sharded_feed as already seen.
+    def emit_projects(projects):
+        batch = []
+        for project in projects:
+            batch.append(project)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                emit(batch)
+                batch = []
+        if batch:
+            emit(batch)
+
+    def attempt_shard(retry_status):
+        with get_shard(session, url, timeout, cache, retry_status, stream=True) as response:
+            if response.status_code == 304:
+                cache.mark_validated(url)
+                with cache.open_snapshot(url) as f:
+                    emit_projects(iter_json_array(iter(lambda: f.read(chunk_size), '')))
+                return
+            body = response.iter_content(chunk_size)
+            if cache:
+                body = cache.store(url, body, response.headers, response.encoding)
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+            chunks = (decoder.decode(chunk) for chunk in body)
+            try:
+                emit_projects(iter_json_array(chunks))
+                # Read any trailing bytes so the cached snapshot is complete
+                for _ in chunks:
+                    pass
+            finally:
+                # An abandoned snapshot is discarded rather than left half-written
+                if cache:
+                    body.close()
+    return with_retries(url, retries, backoff, attempt_shard)
+
+def iter_sharded_feed(shard_urls, workers=4, retries=3, backoff=0.5, timeout=60, cache=None, stream=False):
+    # Yields the projects of every shard. A projReference seen earlier is skipped, so overlapping shards
+    # (e.g. date ranges) and the restart of a streamed shard after a retry are harmless. Without stream the
+    # projects come shard by shard in completion order; with stream the shards' projects interleave.
+    workers = max(1, min(workers, len(shard_urls)))
+    session = make_session(workers)
+    # ('projects', url, [project, ...]), ('done', url, count) or ('error', url, exception)
+    done = queue.Queue(maxsize=workers * STREAM_QUEUE_DEPTH if stream else 0)
+    pending = queue.Queue()
+    for url in shard_urls:
+        pending.put(url)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                done.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        # The consumer has gone; unwind the worker
+        raise InterruptedError("feed shard consumer stopped")
+
+    def worker():
+        while not stop.is_set():
+            try:
+                url = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if stream:
+                    count = 0
+                    def emit(batch):
+                        nonlocal count
+                        count += len(batch)
+                        put(('projects', url, batch))
+                    stream_shard(session, url, emit, retries, backoff, timeout, cache)
+                else:
+                    projects = fetch_shard(session, url, retries, backoff, timeout, cache)
+                    count = len(projects)
+                    put(('projects', url, projects))
+                put(('done', url, count))
+            except InterruptedError:
+                return
+            except Exception as e:
+                try:
+                    put(('error', url, e))
+                except InterruptedError:
+                    return
+
+    threads = [threading.Thread(target=worker, name=f"shard-fetch-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    seen = set()
+    start = time.perf_counter()
+    try:
+        remaining = len(shard_urls)
+        while remaining:
+            kind, url, value = done.get()
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                remaining -= 1
+                logging.info(f"Fetched feed shard {url}: {value} projects")
+                continue
+            for project in value:
+                reference = project['oasisProjDetails']['projReference']
+                if reference in seen:
+                    continue
+                seen.add(reference)
+                yield project
+        logging.info(f"Fetched {len(shard_urls)} feed shards ({len(seen)} projects) in {time.perf_counter() - start:.2f}s")
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        session.close()
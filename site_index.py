@@ -0,0 +1,225 @@
+import csv
+import math
+import time
+import random
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+import numpy as np
+import oracledb
+
+# In-memory spatial index of the points in RESOURCE_DC_COV_COORD, on British National Grid easting and
+# northing. Points are bucketed in a uniform grid of radius-sized cells, so the points within radius of
+# a site are all in the 3x3 cells around it and a lookup costs the same however many points are indexed.
+# The points are held in four flat arrays (cell key, easting, northing, ISSUE_ID) sorted by cell key,
+# 32 bytes a point, and a cell is the run of the arrays found by binary search on its key. Points added
+# during the run wait in a per-cell dict until there are more of them than an eighth of the arrays (and
+# MERGE_MIN_POINTS), then they are sorted into the arrays.
+#
+# match_batch() is called by the loaders once a batch has its ISSUE_IDs: every new coordinate row is
+# checked against the points already known (preloaded, or loaded earlier in the run), matches within
+# radius of another issue's point are flagged, and then the batch's own points are added.
+
+# Distance in metres within which two points are taken to be the same site
+DEFAULT_RADIUS = 10.0
+
+# Points the per-cell dict may hold before a merge, however small the arrays
+MERGE_MIN_POINTS = 4096
+
+# Cell key: column in the high 32 bits, row (offset to be non-negative) in the low 32 bits, so the three
+# cells of a column around a point are consecutive keys
+CELL_ROW_OFFSET = 1 << 31
+
+PRELOAD_SQL = "SELECT EASTING, NORTHING, ISSUE_ID FROM RESOURCE_DC_COV_COORD WHERE EASTING IS NOT NULL AND NORTHING IS NOT NULL"
+
+REPORT_COLUMNS = ('reference', 'issue_id', 'easting', 'northing', 'near_issue_id', 'near_easting', 'near_northing', 'distance_m')
+
+def cell_key(column, row):
+    return (column << 32) + row + CELL_ROW_OFFSET
+
+class SiteIndex:
+    def __init__(self, radius=DEFAULT_RADIUS, report_path=None, fetch_size=5000):
+        self.radius = radius
+        self.fetch_size = fetch_size
+        self._keys = array('q')
+        self._eastings = array('d')
+        self._northings = array('d')
+        self._issue_ids = array('q')
+        # cell key -> [(easting, northing, issue_id)] of the points added since the last merge
+        self._recent = {}
+        self._recent_points = 0
+        self._lock = threading.Lock()
+        self._report_path = report_path
+        self._report_file = None
+        self._report = None
+        self.points = 0
+        self.checked = 0
+        self.flagged = 0
+
+    def __len__(self):
+        return self.points
+
+    def cells(self):
+        # Number of occupied grid cells
+        keys = set(self._recent)
+        keys.update(self._keys)
+        return len(keys)
+
+    def _cell(self, easting, northing):
+        return (int(easting // self.radius), int(northing // self.radius))
+
+    def _merge(self, keys, eastings, northings, issue_ids):
+        # Adds points to the sorted arrays; the sort is done in NumPy and the result copied back
+        def merged(stored, added, dtype):
+            return np.concatenate((np.frombuffer(stored, dtype=dtype), np.asarray(added, dtype=dtype)))
+
+        keys = merged(self._keys, keys, np.int64)
+        order = np.argsort(keys, kind='stable')
+        self._keys = array('q', keys[order].tobytes())
+        self._eastings = array('d', merged(self._eastings, eastings, np.float64)[order].tobytes())
+        self._northings = array('d', merged(self._northings, northings, np.float64)[order].tobytes())
+        self._issue_ids = array('q', merged(self._issue_ids, issue_ids, np.int64)[order].tobytes())
+
+    def _merge_recent(self):
+        points = [(key,) + point for key, cell in self._recent.items() for point in cell]
+        if points:
+            self._merge(*zip(*points))
+        self._recent = {}
+        self._recent_points = 0
+
+    def _add(self, easting, northing, issue_id):
+        self._recent.setdefault(cell_key(*self._cell(easting, northing)), []).append((easting, northing, issue_id))
+        self._recent_points += 1
+        self.points += 1
+        if self._recent_points > max(MERGE_MIN_POINTS, len(self._keys) // 8):
+            self._merge_recent()
+
+    def add(self, easting, northing, issue_id):
+        with self._lock:
+            self._add(easting, northing, issue_id)
+
+    def _nearby(self, easting, northing, exclude_issue_id=None):
+        # (distance, issue_id, easting, northing) of the indexed points within radius, nearest first
+        cx, cy = self._cell(easting, northing)
+        limit = self.radius * self.radius
+        found = []
+        keys = self._keys
+        recent = self._recent
+        for x in (cx - 1, cx, cx + 1):
+            # The three cells of this column are consecutive keys, so one run of the sorted arrays
+            key = cell_key(x, cy)
+            i = bisect_left(keys, key - 1)
+            while i < len(keys) and keys[i] <= key + 1:
+                de = self._eastings[i] - easting
+                dn = self._northings[i] - northing
+                squared = de * de + dn * dn
+                if squared <= limit and self._issue_ids[i] != exclude_issue_id:
+                    found.append((math.sqrt(squared), self._issue_ids[i], self._eastings[i], self._northings[i]))
+                i += 1
+            if not recent:
+                continue
+            for cell in (recent.get(key - 1), recent.get(key), recent.get(key + 1)):
+                for point_easting, point_northing, issue_id in cell or ():
+                    de = point_easting - easting
+                    dn = point_northing - northing
+                    squared = de * de + dn * dn
+                    if squared <= limit and issue_id != exclude_issue_id:
+                        found.append((math.sqrt(squared), issue_id, point_easting, point_northing))
+        found.sort()
+        return found
+
+    def nearby(self, easting, northing, exclude_issue_id=None):
+        with self._lock:
+            return self._nearby(easting, northing, exclude_issue_id)
+
+    def preload(self, cursor):
+        try:
+            start = time.perf_counter()
+            cursor.arraysize = self.fetch_size
+            cursor.execute(PRELOAD_SQL)
+            # Gathered in compact arrays and sorted into the index once
+            keys, eastings, northings, issue_ids = array('q'), array('d'), array('d'), array('q')
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                for easting, northing, issue_id in rows:
+                    easting, northing = float(easting), float(northing)
+                    keys.append(cell_key(*self._cell(easting, northing)))
+                    eastings.append(easting)
+                    northings.append(northing)
+                    issue_ids.append(int(issue_id))
+            with self._lock:
+                self._merge(keys, eastings, northings, issue_ids)
+                self.points += len(keys)
+            logging.info(
+                f"Indexed {self.points} existing coordinate points in {self.cells()} grid cells "
+                f"of {self.radius:g} m in {time.perf_counter() - start:.2f}s."
+            )
+        except oracledb.DatabaseError as e:
+            logging.error(f"Failed to preload coordinate points: {e}")
+            raise
+
+    def _write_report(self, row):
+        if self._report_path is None:
+            return
+        if self._report is None:
+            try:
+                self._report_file = open(self._report_path, 'w', newline='', encoding='utf-8')
+            except IOError as e:
+                logging.error(f"Failed to open site match report {self._report_path}: {e}")
+                raise
+            self._report = csv.writer(self._report_file)
+            self._report.writerow(REPORT_COLUMNS)
+        self._report.writerow(row)
+
+    def match_batch(self, batch, issue_ids):
+        # Flags the coordinate rows of a loaded batch (see transform_project) that lie within radius of a
+        # point of another issue, then indexes them. Returns the number of points flagged.
+        flagged = 0
+        with self._lock:
+            for rows, issue_id in zip(batch, issue_ids):
+                for vector_type, easting, northing, lat, long in rows['coordinates']:
+                    self.checked += 1
+                    found = self._nearby(easting, northing, exclude_issue_id=issue_id)
+                    if found:
+                        flagged += 1
+                        distance, near_issue_id, near_easting, near_northing = found[0]
+                        logging.info(
+                            "Site at (%.0f, %.0f) in %s lies %.1f m from a point of issue %s%s",
+                            easting, northing, rows['reference'], distance, near_issue_id,
+                            f" and {len(found) - 1} more" if len(found) > 1 else ""
+                        )
+                        self._write_report((
+                            rows['reference'], issue_id, easting, northing, near_issue_id, near_easting, near_northing, round(distance, 2)
+                        ))
+                for vector_type, easting, northing, lat, long in rows['coordinates']:
+                    self._add(easting, northing, int(issue_id))
+            self.flagged += flagged
+        return flagged
+
+    def close(self):
+        if self._report_file is not None:
+            self._report_file.close()
+            self._report_file = None
+            self._report = None
+
+if __name__ == "__main__":
+    # Lookup benchmark: random points over the Wales grid envelope, then lookups near known points
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from coordinates import WALES_BNG_BOUNDS
+    rng = random.Random(0)
+    min_e, min_n, max_e, max_n = WALES_BNG_BOUNDS
+    for count in (10000, 100000, 1000000):
+        index = SiteIndex()
+        start = time.perf_counter()
+        points = [(rng.uniform(min_e, max_e), rng.uniform(min_n, max_n)) for _ in range(count)]
+        for issue_id, (easting, northing) in enumerate(points):
+            index.add(easting, northing, issue_id)
+        built = time.perf_counter() - start
+        queries = [(easting + rng.uniform(-5, 5), northing + rng.uniform(-5, 5)) for easting, northing in rng.sample(points, 10000)]
+        start = time.perf_counter()
+        hits = sum(1 for easting, northing in queries if index.nearby(easting, northing))
+        elapsed = time.perf_counter() - start
+        print(f"{count:>8} points: built in {built:.2f}s, {elapsed / len(queries) * 1e6:.1f} us per lookup, {hits} of {len(queries)} matched")
@@ -0,0 +1,92 @@
+import math
+import random
+import logging
+from site_index import SiteIndex, MERGE_MIN_POINTS
+
+# SiteIndex.match_batch against known layouts (radius boundary, neighbouring cells, no match, the
+# project's own points), and nearby() against a brute-force search over points held both in the sorted
+# arrays and in the per-cell dict of points not merged yet.
+
+# Existing points: (easting, northing, ISSUE_ID), on a 10 m grid with cells [300000, 300010) etc.
+existing = [
+    (300005.0, 400005.0, 1),
+    (300019.0, 400005.0, 2),   # neighbouring cell to the east
+    (299995.0, 399995.0, 3),   # diagonally neighbouring cell
+    (300500.0, 400500.0, 4),
+]
+
+def project(reference, *points):
+    return {'reference': reference, 'coordinates': [('Point', easting, northing, None, None) for easting, northing in points]}
+
+# Batches of (project, ISSUE_ID) and the ISSUE_IDs each project's first point should be flagged against
+cases = [
+    ("exactly on the radius", project("R1", (300510.0, 400500.0)), 101, 4),
+    ("just outside the radius", project("R2", (300505.0, 400511.0)), 102, None),
+    ("across a cell boundary", project("R3", (300011.0, 400005.0)), 103, 1),
+    ("in a diagonal neighbouring cell", project("R4", (300002.0, 400002.0)), 104, 1),
+    ("far from every point", project("R5", (350000.0, 450000.0)), 105, None),
+    ("its own issue is not a match", project("R6", (300500.0, 400501.0)), 4, None),
+    ("a point loaded earlier in the run", project("R7", (350003.0, 450004.0)), 107, 105),
+]
+
+class RowsCursor:
+    # Serves rows to SiteIndex.preload as a cursor would
+    def __init__(self, rows):
+        self.rows = rows
+        self.arraysize = 100
+
+    def execute(self, sql):
+        self._position = 0
+
+    def fetchmany(self, size):
+        rows = self.rows[self._position:self._position + size]
+        self._position += size
+        return rows
+
+def brute_force(points, easting, northing, radius):
+    found = []
+    for e, n, issue_id in points:
+        de, dn = e - easting, n - northing
+        if de * de + dn * dn <= radius * radius:
+            found.append((math.sqrt(de * de + dn * dn), issue_id, e, n))
+    return sorted(found)
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Matching batches against indexed points...")
+    index = SiteIndex(radius=10.0)
+    index.preload(RowsCursor(existing))
+    check("preload indexes every point", len(index) == len(existing))
+    for name, rows, issue_id, expected in cases:
+        easting, northing = rows['coordinates'][0][1:3]
+        found = index.nearby(easting, northing, exclude_issue_id=issue_id)
+        flagged = index.match_batch([rows], [issue_id])
+        check(f"{name}: {'matches issue ' + str(expected) if expected else 'no match'}",
+              flagged == (expected is not None) and (found[0][1] if found else None) == expected)
+    check("checked and flagged are counted", index.checked == len(cases) and index.flagged == 4)
+    check("batch points are indexed", len(index) == len(existing) + len(cases))
+    nearest = index.nearby(300010.0, 400005.0)
+    check("nearest first", [issue_id for _, issue_id, _, _ in nearest][:2] == [103, 1])
+
+    print("Comparing lookups with a brute-force search...")
+    rng = random.Random(0)
+    points = [(rng.uniform(300000, 302000), rng.uniform(400000, 402000), i) for i in range(MERGE_MIN_POINTS * 3)]
+    index = SiteIndex(radius=25.0)
+    index.preload(RowsCursor(points[:MERGE_MIN_POINTS]))
+    for easting, northing, issue_id in points[MERGE_MIN_POINTS:]:
+        index.add(easting, northing, issue_id)
+    check("points added during the run are merged into the arrays", len(index._keys) > MERGE_MIN_POINTS and len(index) == len(points))
+    queries = [(rng.uniform(299950, 302050), rng.uniform(399950, 402050)) for _ in range(2000)]
+    check("every lookup agrees with a brute-force search",
+          all(index.nearby(easting, northing) == brute_force(points, easting, northing, 25.0) for easting, northing in queries))
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
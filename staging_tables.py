@@ -0,0 +1,154 @@
+import logging
+import oracledb
+
+# Server-side staging load. Transformed projects are written to GREYLIT_STG_* tables with one array insert
+# per table, and FAN_OUT_SQL then assigns ISSUE_IDs from issue_seq and copies the rows to ISSUE and its
+# child tables with set-based INSERT ... SELECT, all in one round trip. Each batch is tagged with its own
+# LOAD_ID, and SEQ (the project's position in the batch) ties the child rows to their issue. The number of
+# round trips per batch is the same however many projects the batch holds.
+
+# Columns the client writes, in bind order, with their staging types
+STAGING_TABLES = {
+    'GREYLIT_STG_ISSUE': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('REFERENCE', 'VARCHAR2(100)'),
+        ('TITLE', 'VARCHAR2(4000)'), ('ABSTRACT', 'CLOB'), ('YEAR_OF_PUBLICATION', 'VARCHAR2(100)'),
+        ('SERIES_ID', 'NUMBER'), ('SOURCE_ID', 'NUMBER'),
+    ),
+    # PERSON_ID is left NULL for authors the client has not resolved; FAN_OUT_SQL matches them to PERSON
+    'GREYLIT_STG_AUTHOR': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('ORDINAL', 'NUMBER(5)'),
+        ('SURNAME', 'VARCHAR2(255)'), ('FORENAME', 'VARCHAR2(255)'), ('INITIALS', 'VARCHAR2(50)'), ('PERSON_ID', 'NUMBER'),
+    ),
+    'GREYLIT_STG_IDENTIFIER': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('DESCRIPTION', 'VARCHAR2(4000)'), ('TYPE', 'VARCHAR2(100)'),
+    ),
+    'GREYLIT_STG_RELATION': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('URI', 'VARCHAR2(4000)'),
+    ),
+    'GREYLIT_STG_COV_LOC': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('TYPE', 'VARCHAR2(100)'), ('DESCRIPTION', 'VARCHAR2(4000)'),
+    ),
+    'GREYLIT_STG_COV_COORD': (
+        ('LOAD_ID', 'VARCHAR2(64)'), ('SEQ', 'NUMBER(10)'), ('TYPE', 'VARCHAR2(100)'),
+        ('EASTING', 'NUMBER'), ('NORTHING', 'NUMBER'), ('LAT_Y', 'NUMBER'), ('LONG_X', 'NUMBER'),
+    ),
+}
+
+# Columns filled in on the server, and the key FAN_OUT_SQL joins the child tables on
+STAGING_EXTRA_DDL = {
+    'GREYLIT_STG_ISSUE': "ISSUE_ID NUMBER, CONSTRAINT GREYLIT_STG_ISSUE_PK PRIMARY KEY (LOAD_ID, SEQ)",
+}
+
+# Authors match a PERSON with the same names; NULL forenames and initials match each other
+PERSON_MATCH = "p.SURNAME = a.SURNAME AND DECODE(p.FORENAME, a.FORENAME, 1, 0) = 1 AND DECODE(p.INITIALS, a.INITIALS, 1, 0) = 1"
+
+DELETE_STAGED = "\n        ".join(f"DELETE FROM {table} WHERE LOAD_ID = :load_id;" for table in STAGING_TABLES)
+
+FAN_OUT_SQL = f"""
+    BEGIN
+        UPDATE GREYLIT_STG_ISSUE SET ISSUE_ID = issue_seq.NEXTVAL WHERE LOAD_ID = :load_id;
+
+        INSERT INTO PERSON (SURNAME, FORENAME, INITIALS)
+            SELECT DISTINCT a.SURNAME, a.FORENAME, a.INITIALS FROM GREYLIT_STG_AUTHOR a
+            WHERE a.LOAD_ID = :load_id AND a.PERSON_ID IS NULL
+            AND EXISTS (SELECT 1 FROM GREYLIT_STG_ISSUE i WHERE i.LOAD_ID = a.LOAD_ID AND i.SEQ = a.SEQ)
+            AND NOT EXISTS (SELECT 1 FROM PERSON p WHERE {PERSON_MATCH});
+        UPDATE GREYLIT_STG_AUTHOR a SET a.PERSON_ID = (SELECT MIN(p.PERSON_ID) FROM PERSON p WHERE {PERSON_MATCH})
+            WHERE a.LOAD_ID = :load_id AND a.PERSON_ID IS NULL;
+
+        INSERT INTO ISSUE (
+            ISSUE_ID, TITLE, ABSTRACT, YEAR_OF_PUBLICATION, ACCESS_TYPE, LICENSE_TYPE,
+            PUBLICATION_TYPE, PUBLICATION_TYPE2, SERIES_NAME_ID, SOURCE_ID,
+            IS_UNPUBLISHED, WF_STAGE
+        )
+            SELECT ISSUE_ID, TITLE, ABSTRACT, YEAR_OF_PUBLICATION, 'linked', 'Standard',
+                'GreyLitSeries', 'GreyLitSeries', SERIES_ID, SOURCE_ID,
+                1, 'published'
+            FROM GREYLIT_STG_ISSUE WHERE LOAD_ID = :load_id ORDER BY SEQ;
+        INSERT INTO RESOURCE_PERSON (PERSON_ID, RELATIONSHIP_TYPE_ID, ISSUE_ID)
+            SELECT a.PERSON_ID, 4, i.ISSUE_ID FROM GREYLIT_STG_AUTHOR a
+            JOIN GREYLIT_STG_ISSUE i ON i.LOAD_ID = a.LOAD_ID AND i.SEQ = a.SEQ
+            WHERE a.LOAD_ID = :load_id ORDER BY a.SEQ, a.ORDINAL;
+        INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID)
+            SELECT s.DESCRIPTION, s.TYPE, i.ISSUE_ID FROM GREYLIT_STG_IDENTIFIER s
+            JOIN GREYLIT_STG_ISSUE i ON i.LOAD_ID = s.LOAD_ID AND i.SEQ = s.SEQ
+            WHERE s.LOAD_ID = :load_id ORDER BY s.SEQ;
+        INSERT INTO RESOURCE_DC_RELATION (TYPE, URI, ISSUE_ID)
+            SELECT 'URI', s.URI, i.ISSUE_ID FROM GREYLIT_STG_RELATION s
+            JOIN GREYLIT_STG_ISSUE i ON i.LOAD_ID = s.LOAD_ID AND i.SEQ = s.SEQ
+            WHERE s.LOAD_ID = :load_id ORDER BY s.SEQ;
+        INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID)
+            SELECT s.TYPE, s.DESCRIPTION, i.ISSUE_ID FROM GREYLIT_STG_COV_LOC s
+            JOIN GREYLIT_STG_ISSUE i ON i.LOAD_ID = s.LOAD_ID AND i.SEQ = s.SEQ
+            WHERE s.LOAD_ID = :load_id ORDER BY s.SEQ;
+        INSERT INTO RESOURCE_DC_COV_COORD (TYPE, EASTING, NORTHING, ISSUE_ID, COORDINATE_TYPE, LAT_Y, LONG_X)
+            SELECT s.TYPE, s.EASTING, s.NORTHING, i.ISSUE_ID, 'POINT', s.LAT_Y, s.LONG_X FROM GREYLIT_STG_COV_COORD s
+            JOIN GREYLIT_STG_ISSUE i ON i.LOAD_ID = s.LOAD_ID AND i.SEQ = s.SEQ
+            WHERE s.LOAD_ID = :load_id ORDER BY s.SEQ;
+
+        -- Opened before the staging rows are deleted, so it still returns the new ISSUE_IDs
+        OPEN :issue_ids FOR SELECT ISSUE_ID FROM GREYLIT_STG_ISSUE WHERE LOAD_ID = :load_id ORDER BY SEQ;
+        {DELETE_STAGED}
+    END;
+"""
+
+def staging_ddl(table):
+    columns = [f"{name} {type}" for name, type in STAGING_TABLES[table]]
+    if table in STAGING_EXTRA_DDL:
+        columns.append(STAGING_EXTRA_DDL[table])
+    return f"CREATE TABLE {table} ({', '.join(columns)})"
+
+def staging_insert_sql(table):
+    columns = [name for name, _ in STAGING_TABLES[table]]
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(f':{i}' for i in range(1, len(columns) + 1))})"
+
+def ensure_staging_tables(cursor):
+    # Creates any staging table that does not exist yet. DDL commits, so this runs before the load starts.
+    try:
+        cursor.execute("SELECT TABLE_NAME FROM USER_TABLES WHERE TABLE_NAME LIKE 'GREYLIT\\_STG\\_%' ESCAPE '\\'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table in STAGING_TABLES:
+            if table not in existing:
+                cursor.execute(staging_ddl(table))
+                logging.info(f"Created staging table {table}.")
+    except oracledb.DatabaseError as e:
+        logging.error(f"Failed to create the staging tables: {e}")
+        raise
+
+def staging_rows(batch, load_id, source_id, series_id, author_ids=None, first_seq=1):
+    # Flattens a batch of transformed projects (see transform_project) into the rows of each staging table.
+    # author_ids holds the PERSON_IDs resolved by a person cache; without it PERSON_ID is left NULL.
+    # first_seq lets several batches share one LOAD_ID.
+    table_rows = {table: [] for table in STAGING_TABLES}
+    for index, rows in enumerate(batch):
+        seq = first_seq + index
+        table_rows['GREYLIT_STG_ISSUE'].append((load_id, seq, rows['reference']) + rows['issue'] + (series_id, source_id))
+        person_ids = author_ids[index] if author_ids is not None else [None] * len(rows['authors'])
+        table_rows['GREYLIT_STG_AUTHOR'].extend(
+            (load_id, seq, ordinal, author['SURNAME'], author['FORENAME'], author['INITIALS'], person_id)
+            for ordinal, (author, person_id) in enumerate(zip(rows['authors'], person_ids), 1)
+        )
+        table_rows['GREYLIT_STG_IDENTIFIER'].extend((load_id, seq) + row for row in rows['identifiers'])
+        table_rows['GREYLIT_STG_RELATION'].extend((load_id, seq, uri) for uri in rows['relations'])
+        table_rows['GREYLIT_STG_COV_LOC'].extend((load_id, seq) + row for row in rows['locations'])
+        table_rows['GREYLIT_STG_COV_COORD'].extend((load_id, seq) + row for row in rows['coordinates'])
+    return table_rows
+
+def stage_rows(cursor, table_rows):
+    # One executemany per non-empty staging table; returns the number of rows staged
+    row_count = 0
+    for table, rows in table_rows.items():
+        if not rows:
+            continue
+        if table == 'GREYLIT_STG_AUTHOR':
+            # PERSON_ID may be NULL in the first rows, so its type cannot be inferred from them
+            cursor.setinputsizes(None, None, None, None, None, None, oracledb.NUMBER)
+        cursor.executemany(staging_insert_sql(table), rows)
+        row_count += len(rows)
+    return row_count
+
+def fan_out_staged(cursor, load_id):
+    # Runs FAN_OUT_SQL for one LOAD_ID and returns the new ISSUE_IDs in SEQ order
+    issue_ids = cursor.var(oracledb.CURSOR)
+    cursor.execute(FAN_OUT_SQL, load_id=load_id, issue_ids=issue_ids)
+    return [int(row[0]) for row in issue_ids.getvalue().fetchall()]
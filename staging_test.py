@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import logging
+import importlib.util
+from collections import Counter
+from feed_records import read_projects
+from staging_tables import STAGING_TABLES, staging_rows
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The staging path against the direct bulk path on the sample feed: the rows FAN_OUT_SQL copies out of
+# the staging tables (joined to their issue on LOAD_ID and SEQ) must be the rows collect_table_rows
+# gives the bulk loader, column for column.
+
+# Staging table each target table's rows come from
+FANNED_OUT_FROM = {
+    'RESOURCE_PERSON': 'GREYLIT_STG_AUTHOR',
+    'RESOURCE_DC_IDENTIFIER': 'GREYLIT_STG_IDENTIFIER',
+    'RESOURCE_DC_RELATION': 'GREYLIT_STG_RELATION',
+    'RESOURCE_DC_COV_LOC': 'GREYLIT_STG_COV_LOC',
+    'RESOURCE_DC_COV_COORD': 'GREYLIT_STG_COV_COORD',
+}
+
+SOURCE_ID = 7
+SERIES_ID = 3
+
+def load_ingest_module():
+    # The ingest script has a hyphenated file name, so it is loaded by path rather than imported
+    spec = importlib.util.spec_from_file_location('welsh_trusts_greylit', os.path.join(SCRIPT_DIR, 'welsh-trusts-greylit.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def named(table, row):
+    return dict(zip((name for name, _ in STAGING_TABLES[table]), row))
+
+def fan_out(table_rows, issue_ids, columns):
+    # What FAN_OUT_SQL inserts: each staged child row with the ISSUE_ID of its (LOAD_ID, SEQ), in the
+    # target table's column order
+    issues = {}
+    for row in table_rows['GREYLIT_STG_ISSUE']:
+        staged = named('GREYLIT_STG_ISSUE', row)
+        issues[staged['LOAD_ID'], staged['SEQ']] = issue_ids[staged['REFERENCE']]
+    fanned_out = {}
+    for table, staging_table in FANNED_OUT_FROM.items():
+        fanned_out[table] = []
+        for row in table_rows[staging_table]:
+            staged = named(staging_table, row)
+            staged['ISSUE_ID'] = issues[staged['LOAD_ID'], staged['SEQ']]
+            fanned_out[table].append(tuple(staged[column] for column in columns[table]))
+    return fanned_out
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    ingest = load_ingest_module()
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        batch = ingest.transform_batch(read_projects(json.load(f)))
+    issue_ids = {rows['reference']: 1000 + i for i, rows in enumerate(batch)}
+    # PERSON_IDs as a person cache would resolve them: one per distinct name
+    persons = {}
+    author_ids = [[persons.setdefault((a['SURNAME'], a['FORENAME'], a['INITIALS']), len(persons) + 1) for a in rows['authors']] for rows in batch]
+    # Column of each tuple position of collect_table_rows, as update mode reads them back
+    columns = {table: table_columns for table, (table_columns, _) in ingest.UPDATE_TABLES.items()}
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Comparing staged rows with the bulk loader's rows on the sample feed...")
+    expected = ingest.collect_table_rows(batch, [issue_ids[rows['reference']] for rows in batch], author_ids)
+    check("the bulk loader and the fan-out cover the same tables", set(expected) == set(FANNED_OUT_FROM))
+
+    # One batch, as staging_load_batch stages it, and the same projects in two batches under one LOAD_ID,
+    # as export_load_bundle writes them
+    half = len(batch) // 2
+    first = staging_rows(batch[:half], 'bundle', SOURCE_ID, SERIES_ID, author_ids[:half])
+    second = staging_rows(batch[half:], 'bundle', SOURCE_ID, SERIES_ID, author_ids[half:], first_seq=half + 1)
+    for label, table_rows in (
+        ("one batch", staging_rows(batch, 'load', SOURCE_ID, SERIES_ID, author_ids)),
+        ("two batches under one LOAD_ID", {table: first[table] + second[table] for table in STAGING_TABLES}),
+    ):
+        issues = [named('GREYLIT_STG_ISSUE', row) for row in table_rows['GREYLIT_STG_ISSUE']]
+        check(f"{label}: one staged issue per project, each with its own SEQ",
+              len({issue['SEQ'] for issue in issues}) == len(issues) == len(batch))
+        staged_issues = [
+            (issue['TITLE'], issue['ABSTRACT'], issue['YEAR_OF_PUBLICATION'], issue['SERIES_ID'], issue['SOURCE_ID']) for issue in issues
+        ]
+        check(f"{label}: staged issues match the bulk ISSUE rows", staged_issues == ingest.issue_rows(batch, SOURCE_ID, SERIES_ID))
+        fanned_out = fan_out(table_rows, issue_ids, columns)
+        for table, rows in expected.items():
+            check(f"{label}: {table} matches the bulk rows ({len(rows)} rows)", Counter(fanned_out[table]) == Counter(rows))
+
+    # Without a person cache the fan-out matches the authors by name, so the names must be staged in order
+    table_rows = staging_rows(batch, 'load', SOURCE_ID, SERIES_ID)
+    staged = [named('GREYLIT_STG_AUTHOR', row) for row in table_rows['GREYLIT_STG_AUTHOR']]
+    check("unresolved authors are staged by name, in order, with no PERSON_ID",
+          [(a['SURNAME'], a['FORENAME'], a['INITIALS']) for a in staged]
+          == [(a['SURNAME'], a['FORENAME'], a['INITIALS']) for rows in batch for a in rows['authors']]
+          and all(a['PERSON_ID'] is None for a in staged))
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
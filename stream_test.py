@@ -0,0 +1,55 @@
+import json
+from json_stream import iter_json_array
+
+# Arrays that must stream to the same elements as json.loads gives
+valid_arrays = [
+    '[]',
+    ' [ ] ',
+    '[1.5e3]',
+    '[1.5e3, -2, 0.25E-2, 10]',
+    '[12345, "a,b]", true, null, false]',
+    '[{"projReference": "CPAT1", "sites": [1, 2]}, {"projReference": "DAT2"}]',
+    '[[1, [2]], {"a": {"b": []}}, "x\\"y"]',
+]
+
+# Arrays that must raise ValueError
+malformed_arrays = [
+    '[1 2]',
+    '[,1]',
+    '[1,,2]',
+    '[1,]',
+    '[1.5e]',
+    '[1',
+    '{"a": 1}',
+    '[{"a": 1} {"b": 2}]',
+]
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+def main():
+    print("Streaming JSON arrays in chunks of 1 to 3 characters...")
+    failures = 0
+    for size in (1, 2, 3):
+        for text in valid_arrays:
+            try:
+                result = list(iter_json_array(chunked(text, size)))
+            except ValueError as e:
+                result = e
+            expected = json.loads(text)
+            status = "ok" if result == expected else "FAILED"
+            failures += result != expected
+            print(f"{status}: chunk size {size}: {text} -> {result!r}")
+        for text in malformed_arrays:
+            try:
+                result = list(iter_json_array(chunked(text, size)))
+                status = "FAILED"
+                failures += 1
+            except ValueError as e:
+                result = e
+                status = "ok"
+            print(f"{status}: chunk size {size}: {text} -> {result!r}")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import logging
+import importlib.util
+from feed_records import read_projects
+from person_cache import PersonCache
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Update mode against an in-memory SQLite copy of the tables it touches: a second run on an unchanged
+# feed must neither delete nor insert anything, with or without the person cache, and a corrected feed
+# must change only the rows it corrects.
+
+SCHEMA = [
+    "CREATE TABLE ISSUE (ISSUE_ID INTEGER PRIMARY KEY, TITLE, ABSTRACT, YEAR_OF_PUBLICATION)",
+    "CREATE TABLE PERSON (PERSON_ID INTEGER PRIMARY KEY AUTOINCREMENT, SURNAME, FORENAME, INITIALS)",
+    "CREATE TABLE RESOURCE_PERSON (PERSON_ID, RELATIONSHIP_TYPE_ID, ISSUE_ID)",
+    "CREATE TABLE RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID)",
+    "CREATE TABLE RESOURCE_DC_RELATION (TYPE, URI, ISSUE_ID)",
+    "CREATE TABLE RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID)",
+    "CREATE TABLE RESOURCE_DC_COV_COORD (TYPE, EASTING, NORTHING, ISSUE_ID, COORDINATE_TYPE, LAT_Y, LONG_X)",
+]
+
+RETURNING_INTO_RE = re.compile(r'\s+RETURNING\s+(\w+)\s+INTO\s+:(\w+)', re.IGNORECASE)
+
+def load_ingest_module():
+    # The ingest script has a hyphenated file name, so it is loaded by path rather than imported
+    spec = importlib.util.spec_from_file_location('welsh_trusts_greylit', os.path.join(SCRIPT_DIR, 'welsh-trusts-greylit.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def oracle_value(value):
+    # Oracle stores '' as NULL
+    return None if value == '' else value
+
+class ReturnedValue:
+    def __init__(self):
+        self.values = []
+
+    def getvalue(self, i=0):
+        return [self.values[i]]
+
+# Just enough of an oracledb cursor over sqlite3 for the update path: :n binds are positional, '' binds
+# are NULL, RETURNING INTO fills a variable (one value per row) and array DML reports a count per row
+class SqliteCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.cursor()
+        self.arraysize = 100
+        self.outputtypehandler = None
+        self._rowcounts = []
+        self._input_sizes = ()
+
+    def var(self, type, arraysize=1):
+        return ReturnedValue()
+
+    def setinputsizes(self, *args):
+        # Only the positions of RETURNING INTO variables matter here
+        self._input_sizes = args
+
+    def _execute(self, sql, parameters, kwargs):
+        returned = None
+        match = RETURNING_INTO_RE.search(sql)
+        if match:
+            name = match.group(2)
+            returned = kwargs.pop(name) if name in kwargs else self._input_sizes[int(name) - 1]
+            sql = RETURNING_INTO_RE.sub(r' RETURNING \1', sql)
+        sql = re.sub(r':(\d+)', r'?\1', sql)
+        if kwargs:
+            parameters = {name: oracle_value(value) for name, value in kwargs.items()}
+        else:
+            parameters = [oracle_value(value) for value in parameters or ()]
+        self._cursor.execute(sql, parameters)
+        if returned is not None:
+            returned.values.append(self._cursor.fetchone()[0])
+        return self._cursor.rowcount
+
+    def execute(self, sql, parameters=None, **kwargs):
+        self._input_sizes = ()
+        self._execute(sql, parameters, kwargs)
+        return self
+
+    def executemany(self, sql, rows, arraydmlrowcounts=False):
+        self._rowcounts = [self._execute(sql, row, {}) for row in rows]
+        self._input_sizes = ()
+
+    def getarraydmlrowcounts(self):
+        return self._rowcounts
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self.arraysize)
+
+def sample_feed():
+    with open(os.path.join(SCRIPT_DIR, 'welsh_trusts_sample.json'), 'r') as f:
+        return json.load(f)
+
+def seed_database(connection, references):
+    # Projects loaded before: their ISSUE rows with placeholder values and their project numbers only
+    for issue_id, reference in enumerate(references, 1):
+        connection.execute("INSERT INTO ISSUE (ISSUE_ID, TITLE) VALUES (?, ?)", (issue_id, f"Old title {issue_id}"))
+        connection.execute(
+            "INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID) VALUES (?, 'Project Number', ?)", (reference, issue_id)
+        )
+    connection.commit()
+
+def count_rows(connection, table):
+    return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    ingest = load_ingest_module()
+    feed = sample_feed()
+    references = [project['oasisProjDetails']['projReference'] for project in feed]
+    failures = 0
+
+    def check(name, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok' if condition else 'FAILED'}: {name}")
+
+    print("Running update mode twice against an in-memory database...")
+    for label, person_cache in (("without person cache", None), ("with person cache", PersonCache())):
+        connection = sqlite3.connect(':memory:')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        seed_database(connection, references)
+        cursor = SqliteCursor(connection)
+        if person_cache is not None:
+            person_cache.preload(cursor)
+
+        count, (updated, deleted, inserted) = ingest.update_existing_projects(
+            cursor, connection, read_projects(sample_feed()), batch_size=7, person_cache=person_cache
+        )
+        check(f"{label}: first run updates every issue", count == len(references) and updated == len(references))
+        check(f"{label}: first run only inserts child rows", deleted == 0 and inserted > 0)
+        persons = count_rows(connection, 'PERSON')
+        links = count_rows(connection, 'RESOURCE_PERSON')
+
+        count, totals = ingest.update_existing_projects(
+            cursor, connection, read_projects(sample_feed()), batch_size=7, person_cache=person_cache
+        )
+        check(f"{label}: an unchanged feed changes nothing", count == len(references) and totals == [0, 0, 0])
+        check(f"{label}: no duplicate persons", count_rows(connection, 'PERSON') == persons)
+        check(f"{label}: author links kept", count_rows(connection, 'RESOURCE_PERSON') == links)
+
+        # A corrected feed: a new title for the first project and the URLs of another one withdrawn
+        corrected = sample_feed()
+        corrected[0]['oasisProjBiblioList'][0]['title'] += " (revised)"
+        with_urls = next(i for i, project in enumerate(corrected[1:], 1) if any('url' in biblio for biblio in project['oasisProjBiblioList']))
+        dropped = 0
+        for biblio in corrected[with_urls]['oasisProjBiblioList']:
+            dropped += biblio.pop('url', None) is not None
+        count, totals = ingest.update_existing_projects(
+            cursor, connection, read_projects(corrected), batch_size=7, person_cache=person_cache
+        )
+        check(f"{label}: a corrected feed updates one issue and deletes only the withdrawn URLs", totals == [1, dropped, 0])
+        title = connection.execute("SELECT TITLE FROM ISSUE WHERE ISSUE_ID = 1").fetchone()[0]
+        check(f"{label}: the corrected title is stored", title.endswith(" (revised)"))
+        connection.close()
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,56 @@
 import os
+import sys
+import codecs
 import requests
 import oracledb
 import configparser
 import json
 import logging
 import datetime
+import itertools
+import collections
+import argparse
+import contextlib
+import re
+import zlib
+import queue
+import threading
+import asyncio
+import concurrent.futures
+import time
+import uuid
+from feed_cache import FeedCache
+from person_cache import PersonCache, SharedPersonCache
+from person_matcher import PersonMatcher, DEFAULT_SURNAME_THRESHOLD
+from delta_state import DeltaState
+from sharded_feed import iter_sharded_feed
+from json_stream import iter_json_array
+from feed_records import read_projects, FeedInterner
+from site_index import SiteIndex, DEFAULT_RADIUS
+from staging_tables import ensure_staging_tables, staging_rows, stage_rows, fan_out_staged
+from load_bundle import LoadBundle
+from run_journal import RunJournal
+from author_parser import parse_authors
+from run_logging import configure_logging, stop_logging
+from instrumentation import SqlMetrics, InstrumentedConnection, InstrumentedPool, AsyncInstrumentedPool, timed, enable as enable_metrics
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Size of each read from the HTTP response or local file when streaming the feed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Number of projects gathered into each array-bind batch by the bulk loader
+DEFAULT_BATCH_SIZE = 500
+
+# Names under which the source and series rows are found or created in step 3
+SOURCE_NAME = "Welsh Archaeological Trusts - Archwilio"
+SERIES_NAME = "Welsh Archaeological Trusts reports"
+
+# Oracle allows at most 1000 expressions in an IN list
+LOOKUP_CHUNK_SIZE = 1000
+# Rows fetched per round trip when reading lookup results
+LOOKUP_ARRAYSIZE = 1000
+
 def load_config(config_file='config.ini'):
     try:
         config = configparser.ConfigParser()
@@ -20,22 +63,69 @@ def load_config(config_file='config.ini'):
         logging.error(f"Error loading configuration file: {e}")
         raise
 
-def connect_to_api(api_url, use_local):
+def open_local_feed(api_url, cache=None):
+    # Local tier: the last cached snapshot of the feed, or the bundled sample when nothing is cached yet
+    if cache and cache.has_snapshot(api_url):
+        return cache.open_snapshot(api_url)
+    if cache:
+        logging.warning("No cached feed snapshot found; falling back to the local sample file.")
+    json_path = os.path.join(os.path.dirname(__file__), 'welsh_trusts_sample.json')
+    return open(json_path, 'r')
+
+def connect_to_api(api_url, use_local, stream=False, cache=None, shard_urls=None, fetch_options=None):
+    # fetch_options holds the workers, retries, backoff and timeout of sharded_feed.iter_sharded_feed
+    if shard_urls and not use_local:
+        # Shards are downloaded in parallel; when streaming, each is decoded incrementally as well
+        if stream:
+            return iter_sharded_feed(shard_urls, cache=cache, stream=True, **(fetch_options or {}))
+        return list(iter_sharded_feed(shard_urls, cache=cache, **(fetch_options or {})))
+    if stream:
+        # Records are decoded lazily as the step-5 loop consumes them
+        return stream_from_api(api_url, use_local, cache=cache)
+    if not use_local:
+        # A single download still goes through the pooled, retrying gzip fetcher
+        return list(iter_sharded_feed([api_url], cache=cache, **(fetch_options or {})))
+    try:
+        # Open and read the local JSON file
+        with open_local_feed(api_url, cache) as f:
+            json_data = json.load(f)
+        logging.info("Loaded JSON data from local file.")
+        return json_data
+    except IOError as e:
+        logging.error(f"Failed to read JSON file: {e}")
+        raise
+    except ValueError as e:
+        logging.error(f"Invalid JSON data: {e}")
+        raise
+
+def stream_from_api(api_url, use_local, chunk_size=STREAM_CHUNK_SIZE, cache=None):
+    # Streaming counterpart of connect_to_api: yields one project record at a time
+    # while the feed is still being downloaded or read
     try:
         if use_local:
-            # Open and read the local JSON file
-            json_path = os.path.join(os.path.dirname(__file__), 'welsh_trusts_sample.json')
-            with open(json_path, 'r') as f:
-                json_data = json.load(f)
-            logging.info("Loaded JSON data from local file.")
+            with open_local_feed(api_url, cache) as f:
+                logging.info("Streaming JSON data from local file.")
+                yield from iter_json_array(iter(lambda: f.read(chunk_size), ''))
         else:
-            # Fetch JSON data from the API
-            response = requests.get(api_url)
-            response.raise_for_status()
-            json_data = response.json()
-            logging.info("Fetched JSON data from API.")
-
-        return json_data
+            headers = cache.conditional_headers(api_url) if cache else {}
+            with requests.get(api_url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                if response.status_code == 304:
+                    cache.mark_validated(api_url)
+                    with cache.open_snapshot(api_url) as f:
+                        logging.info("Feed not modified; streaming JSON data from cache.")
+                        yield from iter_json_array(iter(lambda: f.read(chunk_size), ''))
+                    return
+                logging.info("Streaming JSON data from API.")
+                body = response.iter_content(chunk_size)
+                if cache:
+                    body = cache.store(api_url, body, response.headers, response.encoding)
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+                chunks = (decoder.decode(chunk) for chunk in body)
+                yield from iter_json_array(chunks)
+                # Read any trailing bytes so the cached snapshot is complete
+                for _ in chunks:
+                    pass
     except IOError as e:
         logging.error(f"Failed to read JSON file: {e}")
         raise
@@ -46,70 +136,101 @@ def connect_to_api(api_url, use_local):
         logging.error(f"Invalid JSON data: {e}")
         raise
 
-def get_project_ids_from_db(cursor):
+@timed
+def get_project_ids_from_db(cursor, project_references=None, chunk_size=LOOKUP_CHUNK_SIZE):
+    # Returns {DESCRIPTION: RESOURCE_DC_IDENTIFIER_ID} for 'Project Number' rows. Given the feed's
+    # references, only those are sent to Oracle (chunk_size bind values per IN list) and only the
+    # matches come back, so the cost follows the size of the feed rather than of the catalogue.
     try:
-        cursor.execute("SELECT RESOURCE_DC_IDENTIFIER_ID, DESCRIPTION FROM RESOURCE_DC_IDENTIFIER WHERE TYPE = 'Project Number'")
-        rows = cursor.fetchall()
-        for row in rows:
-            print(f"Fetched row: {row}")
-        return {row[1]: row[0] for row in rows}  # Return a dictionary with DESCRIPTION as key and RESOURCE_DC_IDENTIFIER_ID as value
+        cursor.arraysize = LOOKUP_ARRAYSIZE
+        if project_references is None:
+            cursor.execute("SELECT RESOURCE_DC_IDENTIFIER_ID, DESCRIPTION FROM RESOURCE_DC_IDENTIFIER WHERE TYPE = 'Project Number'")
+            return {row[1]: row[0] for row in cursor.fetchall()}  # Return a dictionary with DESCRIPTION as key and RESOURCE_DC_IDENTIFIER_ID as value
+
+        project_references = sorted(set(project_references))
+        project_ids = {}
+        for i in range(0, len(project_references), chunk_size):
+            chunk = project_references[i:i + chunk_size]
+            binds = ', '.join(f':{n + 1}' for n in range(len(chunk)))
+            cursor.execute(
+                "SELECT RESOURCE_DC_IDENTIFIER_ID, DESCRIPTION FROM RESOURCE_DC_IDENTIFIER "
+                f"WHERE TYPE = 'Project Number' AND DESCRIPTION IN ({binds})",
+                chunk
+            )
+            project_ids.update({row[1]: row[0] for row in cursor.fetchall()})
+        logging.info(f"Checked {len(project_references)} feed project references; {len(project_ids)} already in the database.")
+        return project_ids
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to fetch project IDs from the database: {e}")
         raise
 
-def parse_authors(authors_str):
-    authors = authors_str.split('&')
-    parsed_authors = []
-    for author in authors:
-        parts = author.strip().split(',')
-        if len(parts) == 2:
-            surname = parts[0].strip()
-            rest = parts[1].strip().split()
-            forename = rest[0] if len(rest) > 0 else ''
-            initials = ' '.join(rest[1:]) if len(rest) > 1 else ''
-            parsed_authors.append({'SURNAME': surname, 'FORENAME': forename, 'INITIALS': initials})
-    return parsed_authors
+def skip_existing_projects(cursor, projects, chunk_size=LOOKUP_CHUNK_SIZE, existing_projects=None, timing=None):
+    # Streaming form of the step-4 check: looks up each chunk of records as it arrives and passes on
+    # only the projects that are not in the database yet. In update mode the others are collected in
+    # existing_projects for update_existing_projects. The lookups run while step 5 consumes the feed, so
+    # their time and the records checked are added up in timing (see RunReport.defer).
+    for chunk in batched(projects, chunk_size):
+        references = [project.reference for project in chunk]
+        start = time.perf_counter()
+        existing = get_project_ids_from_db(cursor, references, chunk_size)
+        if timing is not None:
+            timing['seconds'] += time.perf_counter() - start
+            timing['records'] += len(chunk)
+        for project in chunk:
+            if project.reference not in existing:
+                yield project
+            elif existing_projects is not None:
+                existing_projects.append(project)
 
+@timed
 def insert_project(cursor, project_reference):
     try:
+        project_id_var = cursor.var(oracledb.NUMBER)
         cursor.execute(
             "INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE) VALUES (:description, :type) RETURNING RESOURCE_DC_IDENTIFIER_ID INTO :id",
             description=project_reference,
             type='Project Number',
-            id=cursor.var(oracledb.NUMBER)
+            id=project_id_var
         )
-        project_id = cursor.getvalue(0)
-        logging.info(f"Inserted project with reference: {project_reference} and RESOURCE_DC_IDENTIFIER_ID: {project_id}")
+        project_id = int(project_id_var.getvalue()[0])
+        logging.debug("Inserted project with reference: %s and RESOURCE_DC_IDENTIFIER_ID: %s", project_reference, project_id)
         return project_id
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert project data into the database: {e}")
         raise
 
 def author_exists(cursor, surname, forename, initials):
+    # Oracle stores '' as NULL, so an empty forename or initials must match a NULL column
     cursor.execute(
-        "SELECT PERSON_ID FROM PERSON WHERE SURNAME = :surname AND FORENAME = :forename AND INITIALS = :initials",
+        "SELECT PERSON_ID FROM PERSON WHERE SURNAME = :surname "
+        "AND (FORENAME = :forename OR (FORENAME IS NULL AND :forename IS NULL)) "
+        "AND (INITIALS = :initials OR (INITIALS IS NULL AND :initials IS NULL))",
         surname=surname, forename=forename, initials=initials
     )
     result = cursor.fetchone()
     return result[0] if result else None
 
-def insert_authors(cursor, authors):
+@timed
+def insert_authors(cursor, authors, person_cache=None):
+    if person_cache is not None:
+        return person_cache.resolve(cursor, [authors])[0]
     author_ids = []
     try:
         for author in authors:
             author_id = author_exists(cursor, author['SURNAME'], author['FORENAME'], author['INITIALS'])
             if not author_id:
+                person_id_var = cursor.var(oracledb.NUMBER)
                 cursor.execute(
                     "INSERT INTO PERSON (SURNAME, FORENAME, INITIALS) VALUES (:surname, :forename, :initials) RETURNING PERSON_ID INTO :id",
                     surname=author['SURNAME'],
                     forename=author['FORENAME'],
                     initials=author['INITIALS'],
-                    id=cursor.var(oracledb.NUMBER)
+                    id=person_id_var
                 )
-                author_id = cursor.getvalue(0)
-                logging.info(f"Inserted author: {author} with ID: {author_id}")
+                author_id = int(person_id_var.getvalue()[0])
+                logging.debug("Inserted author: %s with ID: %s", author, author_id)
             else:
-                logging.info(f"Author already exists: {author} with ID: {author_id}")
+                logging.debug("Author already exists: %s with ID: %s", author, author_id)
             author_ids.append(author_id)
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert authors data into the database: {e}")
@@ -142,8 +263,9 @@ def get_next_source_id(cursor):
         logging.error(f"Failed to fetch the next SOURCE_ID: {e}")
         raise
 
+@timed
 def insert_source_and_series(cursor, connection):
-    source_name = "Welsh Archaeological Trusts - Archwilio"
+    source_name = SOURCE_NAME
     source_description = (
         "Archwilio is a Wales-wide database of archaeological and historical information.\n"
         "Clwyd-Powys Archaeological Trust\n"
@@ -174,7 +296,7 @@ def insert_source_and_series(cursor, connection):
         logging.info(f"Source already exists: {source_name} with SOURCE_ID: {source_id}")
 
     # Insert series
-    series_name = "Welsh Archaeological Trusts reports"
+    series_name = SERIES_NAME
     publication_type = "GreyLit"
     series_id = series_exists(cursor, series_name)
     if not series_id:
@@ -240,12 +362,9 @@ def insert_source_and_series(cursor, connection):
 
     return source_id, series_id, series_name_id
 
+@timed
 def insert_issue(cursor, project, source_id, series_id, connection):
     try:
-        title = project['oasisProjBiblioList'][0]['title']
-        abstract = project['oasisProjDetails']['descOutcome']
-        year_of_publication = project['oasisProjBiblioList'][0]['pubdate']
-
         cursor.execute(
             """
             INSERT INTO ISSUE (
@@ -258,16 +377,16 @@ def insert_issue(cursor, project, source_id, series_id, connection):
                 1, 'published'
             )
             """,
-            title=title,
-            abstract=abstract,
-            year_of_publication=year_of_publication,
+            title=project.title,
+            abstract=project.abstract,
+            year_of_publication=project.pubdate,
             series_id=series_id,
             source_id=source_id
         )
         # Optionally, fetch the last inserted ID if needed
         cursor.execute("SELECT issue_seq.CURRVAL FROM dual")
         issue_id = cursor.fetchone()[0]
-        logging.info(f"Inserted issue for project: {project['projReference']} with ISSUE_ID: {issue_id}")
+        logging.debug("Inserted issue for project: %s with ISSUE_ID: %s", project.reference, issue_id)
         return issue_id
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert issue data into the database: {e}")
@@ -280,6 +399,7 @@ def insert_issue(cursor, project, source_id, series_id, connection):
         logging.error(f"Failed to commit transaction: {e}")
         raise
 
+@timed
 def link_authors_to_issue(cursor, author_ids, issue_id):
     try:
         for author_id in author_ids:
@@ -288,47 +408,53 @@ def link_authors_to_issue(cursor, author_ids, issue_id):
                 person_id=author_id,
                 issue_id=issue_id
             )
-            logging.info(f"Linked PERSON_ID {author_id} to ISSUE ID {issue_id}")
+            logging.debug("Linked PERSON_ID %s to ISSUE ID %s", author_id, issue_id)
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to link authors to issue in the database: {e}")
         raise
 
+@timed
 def insert_sites_and_project_number(cursor, project, issue_id):
     try:
         # Insert site codes
-        for site in project['oasisProjSiteList']:
+        for site in project.sites:
             cursor.execute(
                 "INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID) VALUES (:description, 'Site Code', :issue_id)",
-                description=site['sitecode'],
+                description=site.sitecode,
                 issue_id=issue_id
             )
-            logging.info(f"Inserted site code: {site['sitecode']} for issue ID: {issue_id}")
+            logging.debug("Inserted site code: %s for issue ID: %s", site.sitecode, issue_id)
 
         # Insert project number
         cursor.execute(
             "INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID) VALUES (:description, 'Project Number', :issue_id)",
-            description=project['projReference'],
+            description=project.reference,
             issue_id=issue_id
         )
-        logging.info(f"Inserted project number: {project['projReference']} for issue ID: {issue_id}")
+        logging.debug("Inserted project number: %s for issue ID: %s", project.reference, issue_id)
+        return len(project.sites) + 1
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert site codes and project number into the database: {e}")
         raise
 
+@timed
 def insert_bibliographic_urls(cursor, project, issue_id):
+    url_count = 0
     try:
-        for biblio in project['oasisProjBiblioList']:
-            if 'url' in biblio:
-                cursor.execute(
-                    "INSERT INTO RESOURCE_DC_RELATION (TYPE, URI, ISSUE_ID) VALUES ('URI', :uri, :issue_id)",
-                    uri=biblio['url'],
-                    issue_id=issue_id
-                )
-                logging.info(f"Inserted bibliographic URL: {biblio['url']} for issue ID: {issue_id}")
+        for url in project.urls:
+            cursor.execute(
+                "INSERT INTO RESOURCE_DC_RELATION (TYPE, URI, ISSUE_ID) VALUES ('URI', :uri, :issue_id)",
+                uri=url,
+                issue_id=issue_id
+            )
+            logging.debug("Inserted bibliographic URL: %s for issue ID: %s", url, issue_id)
+            url_count += 1
+        return url_count
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert bibliographic URLs into the database: {e}")
         raise
 
+@timed
 def insert_location_data(cursor, project, issue_id, connection):
     try:
         # Insert country
@@ -336,65 +462,66 @@ def insert_location_data(cursor, project, issue_id, connection):
             "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('Country', 'Wales', :issue_id)",
             issue_id=issue_id
         )
-        logging.info(f"Inserted location: Country=Wales for issue ID: {issue_id}")
+        logging.debug("Inserted location: Country=Wales for issue ID: %s", issue_id)
 
         # Insert parish, district, county, and site
-        admin_areas = project['adminAreasMap']
         cursor.execute(
             "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('Parish', :community, :issue_id)",
-            community=admin_areas['Community'],
+            community=project.community,
             issue_id=issue_id
         )
-        logging.info(f"Inserted location: Parish={admin_areas['Community']} for issue ID: {issue_id}")
+        logging.debug("Inserted location: Parish=%s for issue ID: %s", project.community, issue_id)
 
         cursor.execute(
             "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('District', :district, :issue_id)",
-            district=admin_areas['Unitary Authority'],
+            district=project.district,
             issue_id=issue_id
         )
-        logging.info(f"Inserted location: District={admin_areas['Unitary Authority']} for issue ID: {issue_id}")
+        logging.debug("Inserted location: District=%s for issue ID: %s", project.district, issue_id)
 
         cursor.execute(
             "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('County', :county, :issue_id)",
-            county=admin_areas['Old County'],
+            county=project.county,
             issue_id=issue_id
         )
-        logging.info(f"Inserted location: County={admin_areas['Old County']} for issue ID: {issue_id}")
+        logging.debug("Inserted location: County=%s for issue ID: %s", project.county, issue_id)
 
         # Handle site insertion based on conditions
-        site_list = project['oasisProjSiteList']
+        site_list = project.sites
         if len(site_list) == 1:
             # Single site: associate with all issues
             cursor.execute(
                 "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('Site', :sitename, :issue_id)",
-                sitename=site_list[0]['sitename'],
+                sitename=site_list[0].sitename,
                 issue_id=issue_id
             )
-            logging.info(f"Inserted location: Site={site_list[0]['sitename']} for issue ID: {issue_id}")
-        elif len(site_list) > 1 and len(project['oasisProjBiblioList']) == 1:
+            logging.debug("Inserted location: Site=%s for issue ID: %s", site_list[0].sitename, issue_id)
+            return 5
+        elif len(site_list) > 1 and project.biblio_count == 1:
             # Multiple sites, single issue: associate all sites with the issue
             for site in site_list:
                 cursor.execute(
                     "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES ('Site', :sitename, :issue_id)",
-                    sitename=site['sitename'],
+                    sitename=site.sitename,
                     issue_id=issue_id
                 )
-                logging.info(f"Inserted location: Site={site['sitename']} for issue ID: {issue_id}")
-        else:
-            logging.info("Multiple sites and multiple issues detected; no site association made.")
+                logging.debug("Inserted location: Site=%s for issue ID: %s", site.sitename, issue_id)
+            return 4 + len(site_list)
+        logging.debug("Multiple sites and multiple issues detected; no site association made.")
+        return 4
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert location data into the database: {e}")
         raise
 
+@timed
 def insert_coordinates(cursor, project, issue_id, connection):
     try:
-        site_list = project['oasisProjSiteList']
-        if len(site_list) == 1 or len(project['oasisProjBiblioList']) == 1:
+        site_list = project.sites
+        if len(site_list) == 1 or project.biblio_count == 1:
             for site in site_list:
-                coords = site['oasisProjSiteCoordsList']
-                vector_type = coords['vectorType']
-                easting, northing = parse_coordinates(coords['geomNgrOut'])
-                lat, long = parse_coordinates(coords['geomLlOut'])
+                easting, northing = parse_coordinates(site.ngr)
+                # geomLlOut is POINT(longitude,latitude)
+                long, lat = parse_coordinates(site.ll)
 
                 cursor.execute(
                     """
@@ -404,16 +531,17 @@ def insert_coordinates(cursor, project, issue_id, connection):
                         :type, :easting, :northing, :issue_id, 'POINT', :lat, :long
                     )
                     """,
-                    type=vector_type,
+                    type=site.vector_type,
                     easting=easting,
                     northing=northing,
                     issue_id=issue_id,
                     lat=lat,
                     long=long
                 )
-                logging.info(f"Inserted coordinates for site: {site['sitename']} with issue ID: {issue_id}")
-        else:
-            logging.info("Multiple sites and multiple issues detected; no coordinate association made.")
+                logging.debug("Inserted coordinates for site: %s with issue ID: %s", site.sitename, issue_id)
+            return len(site_list)
+        logging.debug("Multiple sites and multiple issues detected; no coordinate association made.")
+        return 0
     except oracledb.DatabaseError as e:
         logging.error(f"Failed to insert coordinates into the database: {e}")
         raise
@@ -423,125 +551,1178 @@ def parse_coordinates(coord_str):
     coord_str = coord_str.replace('POINT(', '').replace(')', '')
     return tuple(map(float, coord_str.split(',')))
 
-def main():
-    total_steps = "?"
+def row_load_projects(cursor, connection, projects, source_id, series_id, person_cache=None, journal=None,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    # Original step-5 path: one statement per row, committed by the caller. With a run journal, every
+    # batch_size projects are committed and journalled here instead. Returns the number of projects.
+    project_count = 0
+    pending = []
+    for project in projects:
+        project_id = insert_project(cursor, project.reference)
+        parsed_authors = parse_authors(project.authors)
+        author_ids = insert_authors(cursor, parsed_authors, person_cache)
+        issue_id = insert_issue(cursor, project, source_id, series_id, connection)
+        link_authors_to_issue(cursor, author_ids, issue_id)
+        identifier_count = insert_sites_and_project_number(cursor, project, issue_id)
+        url_count = insert_bibliographic_urls(cursor, project, issue_id)
+        location_count = insert_location_data(cursor, project, issue_id, connection)
+        # One summary line per project; the per-row trace is logged at DEBUG
+        logging.info(
+            "Project %s: issue %s, %d authors, %d identifiers, %d URLs, %d locations",
+            project.reference, issue_id, len(author_ids), identifier_count, url_count, location_count
+        )
+        project_count += 1
+        if journal is not None:
+            pending.append((project.reference, issue_id))
+            if len(pending) >= batch_size:
+                connection.commit()
+                journal.record_batch(*zip(*pending))
+                pending = []
+    if pending:
+        connection.commit()
+        journal.record_batch(*zip(*pending))
+    return project_count
+
+def batched(iterable, size):
+    # Splits any iterable (including a streamed feed) into lists of at most size items
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def transform_project(project):
+    # Flattens one FeedProject into the row tuples the bulk loader writes. ISSUE_IDs are not known
+    # yet, so child rows leave them out and the loader appends them once the issues are inserted.
+    site_list = project.sites
+
+    locations = [
+        ('Country', 'Wales'),
+        ('Parish', project.community),
+        ('District', project.district),
+        ('County', project.county),
+    ]
+    # Same site association rules as insert_location_data and insert_coordinates
+    if len(site_list) == 1 or (len(site_list) > 1 and project.biblio_count == 1):
+        locations.extend(('Site', site.sitename) for site in site_list)
+
+    # Sites whose coordinates are written; parsed and checked for the whole batch at once by attach_coordinates
+    sites = []
+    if len(site_list) == 1 or project.biblio_count == 1:
+        sites = list(site_list)
+
+    return {
+        'reference': project.reference,
+        'issue': (project.title, project.abstract, project.pubdate),
+        'authors': parse_authors(project.authors),
+        'identifiers': [(site.sitecode, 'Site Code') for site in site_list] + [(project.reference, 'Project Number')],
+        'relations': list(project.urls),
+        'locations': locations,
+        'sites': sites,
+        'coordinates': [],
+    }
+
+def attach_coordinates(batch, coordinate_checker=None):
+    # Coordinate stage: fills in each project's (TYPE, EASTING, NORTHING, LAT_Y, LONG_X) rows. With a
+    # SiteCoordinateChecker every new site in the batch is parsed into arrays in one pass and points that
+    # are outside Wales, have easting/northing swapped or whose grid reference and lon/lat disagree are
+    # dropped with a warning. The result is kept on
+    # the FeedSite, so a site shared by several projects (see FeedInterner) is parsed and checked once.
+    new_sites = {}
+    for rows in batch:
+        for site in rows['sites']:
+            if site.coordinates is None:
+                new_sites.setdefault(id(site), (rows, site))
+    new_sites = list(new_sites.values())
+
+    if coordinate_checker is None:
+        for _, site in new_sites:
+            easting, northing = parse_coordinates(site.ngr)
+            long, lat = parse_coordinates(site.ll)
+            site.coordinates = (site.vector_type, easting, northing, lat, long)
+    elif new_sites:
+        ngr, ll, valid, swapped, mismatched = coordinate_checker.check([site.ngr for _, site in new_sites], [site.ll for _, site in new_sites])
+        for i, (rows, site) in enumerate(new_sites):
+            if valid[i]:
+                site.coordinates = (site.vector_type, float(ngr[i, 0]), float(ngr[i, 1]), float(ll[i, 1]), float(ll[i, 0]))
+                continue
+            site.coordinates = False
+            if swapped[i]:
+                logging.warning(f"Skipped coordinates for site {site.sitename} in {rows['reference']}: easting and northing look swapped ({ngr[i, 0]:.0f}, {ngr[i, 1]:.0f})")
+            elif mismatched[i]:
+                logging.warning(
+                    f"Skipped coordinates for site {site.sitename} in {rows['reference']}: grid reference ({ngr[i, 0]:.0f}, {ngr[i, 1]:.0f}) "
+                    f"does not match its lon/lat ({ll[i, 0]:.5f}, {ll[i, 1]:.5f})"
+                )
+            else:
+                logging.warning(f"Skipped coordinates for site {site.sitename} in {rows['reference']}: point lies outside Wales ({ll[i, 0]:.5f}, {ll[i, 1]:.5f})")
+
+    for rows in batch:
+        rows['coordinates'] = [site.coordinates for site in rows['sites'] if site.coordinates]
+    return batch
+
+@timed
+def transform_batch(projects, coordinate_checker=None):
+    return attach_coordinates([transform_project(project) for project in projects], coordinate_checker)
+
+BULK_INSERT_SQL = {
+    'RESOURCE_PERSON': "INSERT INTO RESOURCE_PERSON (PERSON_ID, RELATIONSHIP_TYPE_ID, ISSUE_ID) VALUES (:1, 4, :2)",
+    'RESOURCE_DC_IDENTIFIER': "INSERT INTO RESOURCE_DC_IDENTIFIER (DESCRIPTION, TYPE, ISSUE_ID) VALUES (:1, :2, :3)",
+    'RESOURCE_DC_RELATION': "INSERT INTO RESOURCE_DC_RELATION (TYPE, URI, ISSUE_ID) VALUES ('URI', :1, :2)",
+    'RESOURCE_DC_COV_LOC': "INSERT INTO RESOURCE_DC_COV_LOC (TYPE, DESCRIPTION, ISSUE_ID) VALUES (:1, :2, :3)",
+    'RESOURCE_DC_COV_COORD': (
+        "INSERT INTO RESOURCE_DC_COV_COORD (TYPE, EASTING, NORTHING, ISSUE_ID, COORDINATE_TYPE, LAT_Y, LONG_X) "
+        "VALUES (:1, :2, :3, :4, 'POINT', :5, :6)"
+    ),
+}
+
+BULK_ISSUE_SQL = """
+    INSERT INTO ISSUE (
+        ISSUE_ID, TITLE, ABSTRACT, YEAR_OF_PUBLICATION, ACCESS_TYPE, LICENSE_TYPE,
+        PUBLICATION_TYPE, PUBLICATION_TYPE2, SERIES_NAME_ID, SOURCE_ID,
+        IS_UNPUBLISHED, WF_STAGE
+    ) VALUES (
+        issue_seq.NEXTVAL, :1, :2, :3, 'linked', 'Standard',
+        'GreyLitSeries', 'GreyLitSeries', :4, :5,
+        1, 'published'
+    ) RETURNING ISSUE_ID INTO :6
+"""
+
+def issue_id_var(cursor, batch):
+    # Array bind receiving one generated ISSUE_ID per row of an executemany of BULK_ISSUE_SQL
+    id_var = cursor.var(oracledb.NUMBER, arraysize=len(batch))
+    cursor.setinputsizes(None, None, None, None, None, id_var)
+    return id_var
+
+def issue_rows(batch, source_id, series_id):
+    return [rows['issue'] + (series_id, source_id) for rows in batch]
+
+def returned_issue_ids(id_var, batch):
+    return [int(id_var.getvalue(i)[0]) for i in range(len(batch))]
+
+@timed
+def bulk_insert_issues(cursor, batch, source_id, series_id):
+    # One executemany for the whole batch; the generated ISSUE_IDs come back through an array RETURNING INTO bind
+    id_var = issue_id_var(cursor, batch)
+    cursor.executemany(BULK_ISSUE_SQL, issue_rows(batch, source_id, series_id))
+    return returned_issue_ids(id_var, batch)
+
+def collect_table_rows(batch, issue_ids, author_ids):
+    # Attaches the generated ISSUE_IDs and PERSON_IDs to the child rows of each project, grouped by table
+    table_rows = {table: [] for table in BULK_INSERT_SQL}
+    for rows, issue_id, person_ids in zip(batch, issue_ids, author_ids):
+        table_rows['RESOURCE_PERSON'].extend((person_id, issue_id) for person_id in person_ids)
+        table_rows['RESOURCE_DC_IDENTIFIER'].extend(row + (issue_id,) for row in rows['identifiers'])
+        table_rows['RESOURCE_DC_RELATION'].extend((uri, issue_id) for uri in rows['relations'])
+        table_rows['RESOURCE_DC_COV_LOC'].extend(row + (issue_id,) for row in rows['locations'])
+        table_rows['RESOURCE_DC_COV_COORD'].extend(
+            (vector_type, easting, northing, issue_id, lat, long)
+            for vector_type, easting, northing, lat, long in rows['coordinates']
+        )
+    return table_rows
+
+@timed
+def bulk_load_batch(cursor, connection, batch, source_id, series_id, person_cache=None):
+    # Writes a batch of transformed projects with one array insert per table, then commits it
+    try:
+        if person_cache is not None:
+            author_ids = person_cache.resolve(cursor, [rows['authors'] for rows in batch])
+        else:
+            author_ids = [insert_authors(cursor, rows['authors']) for rows in batch]
+        issue_ids = bulk_insert_issues(cursor, batch, source_id, series_id)
+
+        row_count = len(issue_ids)
+        for table, rows in collect_table_rows(batch, issue_ids, author_ids).items():
+            if rows:
+                cursor.executemany(BULK_INSERT_SQL[table], rows)
+                row_count += len(rows)
+
+        connection.commit()
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for rows, issue_id, person_ids in zip(batch, issue_ids, author_ids):
+                logging.debug(
+                    "Project %s: issue %s, %d authors, %d identifiers, %d URLs, %d locations, %d coords",
+                    rows['reference'], issue_id, len(person_ids), len(rows['identifiers']), len(rows['relations']),
+                    len(rows['locations']), len(rows['coordinates'])
+                )
+        return issue_ids, row_count
+    except oracledb.DatabaseError as e:
+        logging.error(f"Failed to bulk load batch starting at project {batch[0]['reference']}: {e}")
+        raise
+
+def bulk_load_projects(cursor, connection, projects, source_id, series_id, batch_size=DEFAULT_BATCH_SIZE, person_cache=None,
+                       coordinate_checker=None, journal=None, site_index=None):
+    # Bulk-load path for step 5: projects are transformed, gathered into batches of batch_size and written
+    # with array binds. Returns the number of projects and rows loaded.
+    project_count = 0
+    row_count = 0
+    start = time.perf_counter()
+    for batch in batched(projects, batch_size):
+        batch = transform_batch(batch, coordinate_checker)
+        issue_ids, batch_rows = bulk_load_batch(cursor, connection, batch, source_id, series_id, person_cache)
+        if journal is not None:
+            journal.record_batch([rows['reference'] for rows in batch], issue_ids)
+        if site_index is not None:
+            site_index.match_batch(batch, issue_ids)
+        project_count += len(batch)
+        row_count += batch_rows
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Loaded batch of {len(batch)} projects ({batch_rows} rows); "
+            f"{project_count} projects, {row_count} rows so far at {row_count / elapsed:.0f} rows/s"
+        )
+    elapsed = time.perf_counter() - start
+    logging.info(f"Bulk load finished: {project_count} projects, {row_count} rows in {elapsed:.2f}s ({row_count / elapsed if elapsed else 0:.0f} rows/s)")
+    return project_count, row_count
+
+@timed
+def staging_load_batch(cursor, connection, batch, source_id, series_id, person_cache=None):
+    # Stages a batch of transformed projects with one array insert per staging table, fans it out to ISSUE
+    # and the child tables on the server and commits. Without a person cache the authors are matched to
+    # PERSON (and missing persons inserted) by the fan-out as well.
+    try:
+        author_ids = None
+        if person_cache is not None:
+            author_ids = person_cache.resolve(cursor, [rows['authors'] for rows in batch])
+        load_id = uuid.uuid4().hex
+        row_count = stage_rows(cursor, staging_rows(batch, load_id, source_id, series_id, author_ids))
+        issue_ids = fan_out_staged(cursor, load_id)
+        connection.commit()
+        return issue_ids, row_count
+    except oracledb.DatabaseError as e:
+        logging.error(f"Failed to load staged batch starting at project {batch[0]['reference']}: {e}")
+        raise
+
+def staging_load_projects(cursor, connection, projects, source_id, series_id, batch_size=0, person_cache=None,
+                          coordinate_checker=None, journal=None, site_index=None):
+    # Staging path for step 5: the same transformed rows as the bulk loader, written through the
+    # GREYLIT_STG_* tables (see staging_tables). batch_size 0 loads the whole feed as one batch, in a
+    # fixed number of round trips. Returns the number of projects and rows loaded.
+    ensure_staging_tables(cursor)
+    project_count = 0
+    row_count = 0
+    start = time.perf_counter()
+    for batch in batched(projects, batch_size or sys.maxsize):
+        batch = transform_batch(batch, coordinate_checker)
+        issue_ids, batch_rows = staging_load_batch(cursor, connection, batch, source_id, series_id, person_cache)
+        if journal is not None:
+            journal.record_batch([rows['reference'] for rows in batch], issue_ids)
+        if site_index is not None:
+            site_index.match_batch(batch, issue_ids)
+        project_count += len(batch)
+        row_count += batch_rows
+        logging.info(f"Staged and fanned out batch of {len(batch)} projects ({batch_rows} rows); {project_count} projects so far")
+    elapsed = time.perf_counter() - start
+    logging.info(f"Staging load finished: {project_count} projects, {row_count} rows in {elapsed:.2f}s ({row_count / elapsed if elapsed else 0:.0f} rows/s)")
+    return project_count, row_count
+
+def export_load_bundle(projects, directory, batch_size=DEFAULT_BATCH_SIZE, coordinate_checker=None):
+    # Offline alternative to step 5: runs the same transformation and writes the staging rows of the whole
+    # feed, under one LOAD_ID, to a load bundle (see load_bundle) instead of the database. Authors are left
+    # for the fan-out to match to PERSON. Returns the number of projects exported.
+    bundle = LoadBundle(directory, uuid.uuid4().hex)
+    try:
+        for batch in batched(projects, batch_size):
+            batch = transform_batch(batch, coordinate_checker)
+            bundle.write(staging_rows(batch, bundle.load_id, None, None, first_seq=bundle.projects + 1), len(batch))
+        bundle.finish(SOURCE_NAME, SERIES_NAME)
+    finally:
+        bundle.close()
+    return bundle.projects
+
+# Update mode. Child rows as collect_table_rows builds them, keyed by table: the column of each tuple
+# position (ISSUE_ID included) and the filter that limits the stored rows to those the loader writes
+UPDATE_TABLES = {
+    'RESOURCE_PERSON': (('PERSON_ID', 'ISSUE_ID'), "RELATIONSHIP_TYPE_ID = 4"),
+    'RESOURCE_DC_IDENTIFIER': (('DESCRIPTION', 'TYPE', 'ISSUE_ID'), None),
+    'RESOURCE_DC_RELATION': (('URI', 'ISSUE_ID'), "TYPE = 'URI'"),
+    'RESOURCE_DC_COV_LOC': (('TYPE', 'DESCRIPTION', 'ISSUE_ID'), None),
+    'RESOURCE_DC_COV_COORD': (('TYPE', 'EASTING', 'NORTHING', 'ISSUE_ID', 'LAT_Y', 'LONG_X'), None),
+}
+
+# The abstract is bound straight into the CLOB column, as in the INSERT paths, so it may exceed 4000 bytes
+UPDATE_ISSUE_SQL = "UPDATE ISSUE SET TITLE = :1, ABSTRACT = :2, YEAR_OF_PUBLICATION = :3 WHERE ISSUE_ID = :4"
+
+def delete_row_sql(table):
+    # Stale rows are deleted by the ROWID they were read with, never by their (rounded) values
+    return f"DELETE FROM {table} WHERE ROWID = :1"
+
+def lobs_as_strings(cursor, metadata):
+    # Output type handler: CLOBs are fetched inline as strings instead of one LOB read per row
+    if metadata.type_code is oracledb.DB_TYPE_CLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+
+def comparable(value):
+    # Puts stored and feed values on the same footing: '' is NULL as in Oracle and coordinates are
+    # compared to six decimal places
+    if value == '':
+        return None
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+def issue_key(values):
+    # TITLE, ABSTRACT and YEAR_OF_PUBLICATION as text, since the feed gives the year as a string
+    return tuple(None if value is None else str(value) for value in map(comparable, values))
+
+def fetch_in_chunks(cursor, sql, values, chunk_size=LOOKUP_CHUNK_SIZE):
+    # Runs sql (with an {in_list} placeholder) for each chunk of values and returns all rows, with any
+    # CLOB columns fetched as strings
+    rows = []
+    values = list(values)
+    cursor.arraysize = LOOKUP_ARRAYSIZE
+    cursor.outputtypehandler = lobs_as_strings
+    try:
+        for i in range(0, len(values), chunk_size):
+            chunk = values[i:i + chunk_size]
+            cursor.execute(sql.format(in_list=', '.join(f':{n + 1}' for n in range(len(chunk)))), chunk)
+            rows.extend(cursor.fetchall())
+    finally:
+        cursor.outputtypehandler = None
+    return rows
+
+def existing_issue_ids(cursor, references):
+    issue_ids = {}
+    for reference, issue_id in fetch_in_chunks(
+        cursor,
+        "SELECT DESCRIPTION, ISSUE_ID FROM RESOURCE_DC_IDENTIFIER "
+        "WHERE TYPE = 'Project Number' AND ISSUE_ID IS NOT NULL AND DESCRIPTION IN ({in_list}) ORDER BY ISSUE_ID",
+        references
+    ):
+        if reference in issue_ids:
+            logging.warning(f"Project {reference} has more than one issue; updating ISSUE_ID {issue_ids[reference]} only.")
+            continue
+        issue_ids[reference] = int(issue_id)
+    return issue_ids
+
+def stored_table_rows(cursor, issue_ids):
+    # {table: {comparable row tuple: [ROWID, ...]}} for the given issues, one query per table and chunk
+    stored = {}
+    for table, (columns, row_filter) in UPDATE_TABLES.items():
+        where = f"{row_filter} AND " if row_filter else ""
+        rows = fetch_in_chunks(
+            cursor, f"SELECT ROWID, {', '.join(columns)} FROM {table} WHERE {where}ISSUE_ID IN ({{in_list}})", issue_ids
+        )
+        stored[table] = collections.defaultdict(list)
+        for row in rows:
+            stored[table][tuple(comparable(value) for value in row[1:])].append(row[0])
+    return stored
+
+@timed
+def update_batch(cursor, connection, batch, issue_ids, person_cache=None):
+    # Brings the stored rows of a batch of existing projects in line with the feed: one array UPDATE for
+    # the changed issues, then per table one executemany DELETE (by ROWID) of the rows that went away and
+    # one array INSERT of the new ones, all in one transaction. Returns (issues updated, rows deleted,
+    # rows inserted), counted from the rows the database reports as affected.
+    try:
+        if person_cache is not None:
+            author_ids = person_cache.resolve(cursor, [rows['authors'] for rows in batch])
+        else:
+            author_ids = [insert_authors(cursor, rows['authors']) for rows in batch]
+
+        stored_issues = {
+            int(row[0]): issue_key(row[1:])
+            for row in fetch_in_chunks(cursor, "SELECT ISSUE_ID, TITLE, ABSTRACT, YEAR_OF_PUBLICATION FROM ISSUE WHERE ISSUE_ID IN ({in_list})", issue_ids)
+        }
+        issue_updates = [
+            rows['issue'] + (issue_id,) for rows, issue_id in zip(batch, issue_ids)
+            if stored_issues.get(issue_id) != issue_key(rows['issue'])
+        ]
+        updated = 0
+        if issue_updates:
+            cursor.executemany(UPDATE_ISSUE_SQL, issue_updates, arraydmlrowcounts=True)
+            updated = sum(cursor.getarraydmlrowcounts())
+
+        stored = stored_table_rows(cursor, issue_ids)
+        deleted = 0
+        inserted = 0
+        for table, rows in collect_table_rows(batch, issue_ids, author_ids).items():
+            wanted = collections.defaultdict(list)
+            for row in rows:
+                wanted[tuple(comparable(value) for value in row)].append(row)
+            # The surplus stored copies of each row go; the feed rows (unrounded) without a stored copy are inserted
+            removed = [
+                (rowid,) for key, rowids in stored[table].items()
+                for rowid in rowids[len(wanted.get(key, ())):]
+            ]
+            added = [row for key, feed_rows in wanted.items() for row in feed_rows[len(stored[table].get(key, ())):]]
+            if removed:
+                cursor.executemany(delete_row_sql(table), removed, arraydmlrowcounts=True)
+                table_deleted = sum(cursor.getarraydmlrowcounts())
+                if table_deleted != len(removed):
+                    logging.warning(f"{table}: {len(removed) - table_deleted} of {len(removed)} stale rows were already gone.")
+                deleted += table_deleted
+            if added:
+                cursor.executemany(BULK_INSERT_SQL[table], added)
+                inserted += len(added)
+
+        connection.commit()
+        return updated, deleted, inserted
+    except oracledb.DatabaseError as e:
+        logging.error(f"Failed to update batch starting at project {batch[0]['reference']}: {e}")
+        raise
+
+def update_existing_projects(cursor, connection, projects, batch_size=DEFAULT_BATCH_SIZE, person_cache=None, coordinate_checker=None,
+                             delta_state=None):
+    # Update mode for step 5: projects already in the database are transformed like new ones and diffed
+    # against their stored rows, so upstream corrections reach ISSUE and its child tables.
+    project_count = 0
+    totals = [0, 0, 0]
+    for batch in batched(projects, batch_size):
+        batch = transform_batch(batch, coordinate_checker)
+        issue_ids = existing_issue_ids(cursor, [rows['reference'] for rows in batch])
+        missing = [rows['reference'] for rows in batch if rows['reference'] not in issue_ids]
+        if missing:
+            logging.warning(f"No issue found to update for projects: {', '.join(missing)}")
+            batch = [rows for rows in batch if rows['reference'] in issue_ids]
+        if not batch:
+            continue
+        counts = update_batch(cursor, connection, batch, [issue_ids[rows['reference']] for rows in batch], person_cache)
+        if delta_state is not None:
+            delta_state.mark_loaded(rows['reference'] for rows in batch)
+        totals = [total + count for total, count in zip(totals, counts)]
+        project_count += len(batch)
+        logging.info(f"Updated batch of {len(batch)} projects: {counts[0]} issues changed, {counts[1]} rows deleted, {counts[2]} rows inserted")
+    logging.info(
+        f"Update finished: {project_count} existing projects compared, {totals[0]} issues changed, "
+        f"{totals[1]} rows deleted, {totals[2]} rows inserted."
+    )
+    return project_count, totals
+
+def project_shard(reference, shard_by, workers, trust_shards):
+    # Picks the worker for a project. By trust, each trust prefix of the reference (CPAT, DAT, GGAT, GAT)
+    # gets the next worker in turn the first time it is seen; otherwise projects are spread by hash.
+    if shard_by == 'trust':
+        match = re.match(r'[A-Za-z]+', reference)
+        trust = match.group(0).upper() if match else ''
+        return trust_shards.setdefault(trust, len(trust_shards) % workers)
+    return zlib.crc32(reference.encode('utf-8')) % workers
+
+def parallel_load_projects(pool, projects, source_id, series_id, workers, batch_size=DEFAULT_BATCH_SIZE,
+                           shard_by='trust', person_cache=None, coordinate_checker=None, journal=None, site_index=None):
+    # Parallel variant of bulk_load_projects: projects are sharded across worker threads, each of which
+    # loads and commits its own batches on a pooled connection. Person rows are shared through a
+    # SharedPersonCache so that concurrent workers never insert the same author twice.
+    if person_cache is None:
+        person_cache = PersonCache()
+        with pool.acquire() as connection:
+            person_cache.preload(connection.cursor())
+    shared_persons = SharedPersonCache(person_cache, pool.acquire())
+
+    queues = [queue.Queue(maxsize=batch_size * 2) for _ in range(workers)]
+    trust_shards = {}
+    totals = [[0, 0] for _ in range(workers)]
+    errors = []
+    start = time.perf_counter()
+
+    def drain(work_queue):
+        while work_queue.get() is not None:
+            pass
+
+    def worker(index):
+        work_queue = queues[index]
+        try:
+            with pool.acquire() as connection:
+                cursor = connection.cursor()
+                batch = []
+                while True:
+                    project = work_queue.get()
+                    if project is not None:
+                        batch.append(project)
+                    if batch and (project is None or len(batch) >= batch_size):
+                        transformed = transform_batch(batch, coordinate_checker)
+                        issue_ids, batch_rows = bulk_load_batch(cursor, connection, transformed, source_id, series_id, shared_persons)
+                        if journal is not None:
+                            journal.record_batch([rows['reference'] for rows in transformed], issue_ids)
+                        if site_index is not None:
+                            site_index.match_batch(transformed, issue_ids)
+                        totals[index][0] += len(batch)
+                        totals[index][1] += batch_rows
+                        logging.info(f"Worker {index}: loaded batch of {len(batch)} projects ({batch_rows} rows)")
+                        batch = []
+                    if project is None:
+                        break
+                cursor.close()
+        except Exception as e:
+            logging.error(f"Worker {index} failed: {e}")
+            errors.append(e)
+            # Keep consuming so the producer never blocks on a full queue
+            drain(work_queue)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"loader-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for project in projects:
+            if errors:
+                break
+            reference = project.reference
+            queues[project_shard(reference, shard_by, workers, trust_shards)].put(project)
+    finally:
+        for work_queue in queues:
+            work_queue.put(None)
+        for thread in threads:
+            thread.join()
+        shared_persons.close()
+
+    if errors:
+        raise errors[0]
+    project_count = sum(total[0] for total in totals)
+    row_count = sum(total[1] for total in totals)
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Parallel load finished with {workers} workers: {project_count} projects, {row_count} rows "
+        f"in {elapsed:.2f}s ({row_count / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+    return project_count, row_count
+
+# Per-process state of the pipeline's transform workers, set by init_transform_worker
+_worker_checker = None
+
+def init_transform_worker(coordinate_checker, log_level):
+    # Worker processes log straight to stderr; a queue handler inherited from the parent has no listener here
+    global _worker_checker
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    _worker_checker = coordinate_checker
+    if coordinate_checker is not None and coordinate_checker.boundary is not None:
+        import shapely
+        shapely.prepare(coordinate_checker.boundary)
+
+def transform_in_worker(projects):
+    # Returns the transformed batch with this batch's coordinate counts (see SiteCoordinateChecker.counts),
+    # which the parent adds to its own checker
+    checker = _worker_checker
+    if checker is None:
+        return transform_batch(projects), None
+    before = checker.counts()
+    batch = transform_batch(projects, checker)
+    return batch, tuple(after - count for after, count in zip(checker.counts(), before))
+
+def pipelined_load_projects(cursor, connection, projects, source_id, series_id, batch_size=DEFAULT_BATCH_SIZE, person_cache=None,
+                            coordinate_checker=None, journal=None, transform_workers=None, queue_depth=4, site_index=None):
+    # Three-stage variant of bulk_load_projects. A fetch thread pulls records from the (streamed) feed,
+    # including the step-4 and delta filters, and submits each batch to a ProcessPoolExecutor that runs
+    # transform_batch. This thread loads the transformed batches in feed order. At most queue_depth
+    # batches are in flight, so reading, transforming and writing overlap with bounded memory.
+    in_flight = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    fetch_errors = []
+    load_cursor = connection.cursor()
+    project_count = 0
+    row_count = 0
+    waited = 0.0
+    start = time.perf_counter()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                in_flight.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch(executor):
+        try:
+            for batch in batched(projects, batch_size):
+                if not put(executor.submit(transform_in_worker, batch)):
+                    return
+        except Exception as e:
+            logging.error(f"Fetch stage failed: {e}")
+            fetch_errors.append(e)
+        finally:
+            put(None)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=transform_workers, initializer=init_transform_worker,
+        initargs=(coordinate_checker, logging.getLogger().getEffectiveLevel())
+    ) as executor:
+        fetcher = threading.Thread(target=fetch, args=(executor,), name="pipeline-fetch", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                future = in_flight.get()
+                if future is None:
+                    break
+                batch, coordinate_counts = future.result()
+                waited += time.perf_counter() - wait_start
+                if coordinate_checker is not None:
+                    coordinate_checker.add_counts(coordinate_counts)
+                issue_ids, batch_rows = bulk_load_batch(load_cursor, connection, batch, source_id, series_id, person_cache)
+                if journal is not None:
+                    journal.record_batch([rows['reference'] for rows in batch], issue_ids)
+                if site_index is not None:
+                    site_index.match_batch(batch, issue_ids)
+                project_count += len(batch)
+                row_count += batch_rows
+                logging.info(f"Loaded batch of {len(batch)} projects ({batch_rows} rows); {project_count} projects, {row_count} rows so far")
+        finally:
+            # On a load error the fetch thread is released and transforms not yet started are dropped
+            stop.set()
+            while not in_flight.empty():
+                future = in_flight.get_nowait()
+                if future is not None:
+                    future.cancel()
+            fetcher.join()
+            load_cursor.close()
+
+    if fetch_errors:
+        raise fetch_errors[0]
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Pipelined load finished: {project_count} projects, {row_count} rows in {elapsed:.2f}s "
+        f"({row_count / elapsed if elapsed else 0:.0f} rows/s); the loader waited {waited:.2f}s for fetch and transform"
+    )
+    return project_count, row_count
+
+@timed
+async def async_load_batch(connection, batch, source_id, series_id, author_ids):
+    # Async counterpart of bulk_load_batch for one oracledb AsyncConnection
+    cursor = connection.cursor()
+    try:
+        id_var = issue_id_var(cursor, batch)
+        await cursor.executemany(BULK_ISSUE_SQL, issue_rows(batch, source_id, series_id))
+        issue_ids = returned_issue_ids(id_var, batch)
+
+        row_count = len(issue_ids)
+        for table, rows in collect_table_rows(batch, issue_ids, author_ids).items():
+            if rows:
+                await cursor.executemany(BULK_INSERT_SQL[table], rows)
+                row_count += len(rows)
+
+        await connection.commit()
+        return issue_ids, row_count
+    except oracledb.DatabaseError as e:
+        logging.error(f"Failed to load project {batch[0]['reference']}: {e}")
+        raise
+    finally:
+        cursor.close()
+
+async def async_load_projects(pool, projects, source_id, series_id, concurrency, batch_size=1, person_cache=None,
+                              coordinate_checker=None, journal=None, site_index=None):
+    # asyncio variant of the step-5 load: up to concurrency per-project (or per-batch) pipelines are in
+    # flight at once on an oracledb AsyncConnectionPool, so their round trips overlap on one event loop.
+    # Feed records from a blocking stream are pulled in a worker thread so the loop is never stalled.
+    if person_cache is None:
+        person_cache = PersonCache()
+        async with pool.acquire() as connection:
+            await person_cache.preload_async(connection.cursor())
+
+    person_lock = asyncio.Lock()
+    person_connection = await pool.acquire()
+    person_cursor = person_connection.cursor()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    errors = []
+    totals = [0, 0]
+    start = time.perf_counter()
+
+    async def resolve_persons(batch):
+        # New persons are created and committed one batch at a time so concurrent pipelines share them
+        async with person_lock:
+            inserted = person_cache.inserted
+            person_ids = await person_cache.resolve_async(person_cursor, [rows['authors'] for rows in batch])
+            if person_cache.inserted != inserted:
+                await person_connection.commit()
+        return person_ids
+
+    async def pipeline(batch):
+        try:
+            author_ids = await resolve_persons(batch)
+            async with pool.acquire() as connection:
+                issue_ids, row_count = await async_load_batch(connection, batch, source_id, series_id, author_ids)
+            if journal is not None:
+                journal.record_batch([rows['reference'] for rows in batch], issue_ids)
+            if site_index is not None:
+                site_index.match_batch(batch, issue_ids)
+            totals[0] += len(batch)
+            totals[1] += row_count
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    if isinstance(projects, (list, tuple)):
+        async def next_batch(iterator):
+            return next(iterator, None)
+    else:
+        async def next_batch(iterator):
+            return await asyncio.to_thread(next, iterator, None)
+
+    iterator = (transform_batch(batch, coordinate_checker) for batch in batched(projects, batch_size))
+    try:
+        while not errors:
+            batch = await next_batch(iterator)
+            if batch is None:
+                break
+            await semaphore.acquire()
+            task = asyncio.create_task(pipeline(batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        person_cursor.close()
+        await person_connection.close()
+
+    if errors:
+        raise errors[0]
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Async load finished with concurrency {concurrency}: {totals[0]} projects, {totals[1]} rows "
+        f"in {elapsed:.2f}s ({totals[1] / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+    return totals[0], totals[1]
+
+async def run_async_load(username, password, dsn, projects, source_id, series_id, concurrency, batch_size=1, person_cache=None,
+                         coordinate_checker=None, metrics=None, journal=None, site_index=None):
+    pool = oracledb.create_pool_async(user=username, password=password, dsn=dsn, min=1, max=concurrency + 2, increment=1)
+    if metrics is not None:
+        pool = AsyncInstrumentedPool(pool, metrics)
+    try:
+        return await async_load_projects(
+            pool, projects, source_id, series_id, concurrency, batch_size, person_cache, coordinate_checker, journal, site_index
+        )
+    finally:
+        await pool.close()
+
+def metrics_path(config, option, default_name):
+    # An empty file name switches that output off. A directory (such as a node_exporter textfile directory)
+    # gets the default file name inside it, rather than a file named after the directory.
+    name = config.get('METRICS', option, fallback=default_name)
+    if not name:
+        return None
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    if os.path.isdir(path) or name.endswith(('/', os.sep)):
+        path = os.path.join(path, default_name)
+    return path
+
+def confirm(prompt, assume_yes=False):
+    # Replaces the interactive prompts when running unattended
+    if assume_yes:
+        print(f"{prompt} yes (non-interactive)")
+        return True
+    return input(prompt).lower() == 'yes'
+
+class RunReport:
+    # Wall time, record count and throughput for each named stage of a run, written out as JSON at exit
+    def __init__(self):
+        self.started_at = datetime.datetime.now()
+        self.stages = []
+        self._deferred = []
+
+    @staticmethod
+    def _rate(entry):
+        if entry['records'] is not None and entry['wall_seconds'] > 0:
+            entry['records_per_second'] = round(entry['records'] / entry['wall_seconds'], 1)
+        else:
+            entry['records_per_second'] = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        entry = {'stage': name, 'status': 'ok', 'records': None}
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception:
+            entry['status'] = 'failed'
+            raise
+        finally:
+            entry['wall_seconds'] = round(time.perf_counter() - start, 3)
+            self._rate(entry)
+            self.stages.append(entry)
+
+    def defer(self, entry, timing, consumer):
+        # For a stage whose work runs lazily inside a later one (step 4 on a streamed feed runs as step 5
+        # reads the feed): the 'seconds' and 'records' gathered in timing are moved from the consumer
+        # stage to entry when the report is built
+        self._deferred.append((entry, timing, consumer))
+
+    def _settle(self):
+        for entry, timing, consumer in self._deferred:
+            for stage in self.stages:
+                if stage['stage'] == consumer:
+                    stage['wall_seconds'] = round(max(stage['wall_seconds'] - timing['seconds'], 0), 3)
+                    self._rate(stage)
+            entry['wall_seconds'] = round(entry['wall_seconds'] + timing['seconds'], 3)
+            entry['records'] = timing['records']
+            self._rate(entry)
+        self._deferred = []
+
+    def as_dict(self, exit_code):
+        self._settle()
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'exit_code': exit_code,
+            'total_wall_seconds': round(sum(entry['wall_seconds'] for entry in self.stages), 3),
+            'stages': self.stages,
+        }
+
+    def write(self, exit_code, report_path=None):
+        # Call once logging is stopped (see main), so that no queued record follows the report line
+        report = self.as_dict(exit_code)
+        if report_path:
+            try:
+                with open(report_path, 'w') as f:
+                    json.dump(report, f, indent=2)
+                logging.info(f"Run report written to {report_path}")
+            except IOError as e:
+                logging.error(f"Failed to write run report: {e}")
+        # The report is the last line of output, after anything logged to stderr
+        sys.stderr.flush()
+        print(json.dumps(report), flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest Welsh Archaeological Trusts grey literature from the Archwilio feed.")
+    parser.add_argument('-y', '--yes', action='store_true', help="run every step without prompting (batch mode)")
+    parser.add_argument('--config', default='config.ini', help="configuration file, relative to this script")
+    parser.add_argument('--report', help="write the per-stage timing report to this JSON file")
+    parser.add_argument('--resume', action='store_true', help="skip the projects committed by an unfinished earlier run, as recorded in the run journal")
+    parser.add_argument('--export', metavar='DIRECTORY', help="transform the feed into an offline load bundle (CSV and SQL*Loader files) instead of loading the database")
+    parser.add_argument('--log-level', help="override [LOGGING] level, e.g. DEBUG for the per-row trace")
+    args = parser.parse_args(argv)
+    if args.resume and args.export:
+        # An export writes no run journal, so there is nothing to resume from
+        parser.error("--resume cannot be combined with --export")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = RunReport()
+    exit_code = run_pipeline(args, report)
+    # Drains the log queue first, so the report is not followed by records still being written
+    stop_logging()
+    report.write(exit_code, args.report)
+    return exit_code
+
+def run_pipeline(args, report):
+    total_steps = 5
+    connection = None
+    cursor = None
+    metrics = None
+    journal = None
+    site_index = None
     try:
         print(f"Step 1/{total_steps}: Loading configuration")
-        config = load_config()
+        with report.stage('load_config'):
+            config = load_config(args.config)
+            configure_logging(
+                args.log_level or config.get('LOGGING', 'level', fallback='INFO'),
+                config.getboolean('LOGGING', 'queued', fallback=True)
+            )
 
-        # Read configuration values
-        api_url = config['API']['url']
-        use_local = config.getboolean('API', 'use_local')
+            # Read configuration values
+            api_url = config['API']['url']
+            use_local = config.getboolean('API', 'use_local')
+            stream = config.getboolean('API', 'stream', fallback=False)
+            shard_urls = config.get('API', 'shard_urls', fallback='').split()
+            fetch_options = {
+                'workers': config.getint('API', 'fetch_workers', fallback=4),
+                'retries': config.getint('API', 'retries', fallback=3),
+                'backoff': config.getfloat('API', 'backoff', fallback=0.5),
+                'timeout': config.getfloat('API', 'timeout', fallback=60),
+            }
+            bulk = config.getboolean('LOAD', 'bulk', fallback=False)
+            batch_size = config.getint('LOAD', 'batch_size', fallback=DEFAULT_BATCH_SIZE)
+            # preload: read all of PERSON up front; lazy: load surnames on demand into an LRU of cache_size keys
+            author_cache = config.get('AUTHORS', 'cache', fallback='off')
+            fuzzy_match = config.getboolean('AUTHORS', 'fuzzy_match', fallback=False)
+            if fuzzy_match and author_cache != 'preload':
+                # Near-duplicates are matched against an index of the whole PERSON table
+                logging.info(f"[AUTHORS] fuzzy_match needs the whole PERSON table; using cache = preload instead of {author_cache}.")
+                author_cache = 'preload'
+            workers = config.getint('PARALLEL', 'workers', fallback=1)
+            shard_by = config.get('PARALLEL', 'shard_by', fallback='trust')
+            async_engine = config.getboolean('ASYNC', 'enabled', fallback=False)
+            async_concurrency = config.getint('ASYNC', 'concurrency', fallback=8)
+            async_batch_size = config.getint('ASYNC', 'batch_size', fallback=1)
+            pipeline = config.getboolean('PIPELINE', 'enabled', fallback=False)
+            staging = config.getboolean('STAGING', 'enabled', fallback=False)
+            staging_batch_size = config.getint('STAGING', 'batch_size', fallback=0)
+            # Update mode: projects already in the database are compared with the feed instead of being dropped
+            existing_projects = [] if config.getboolean('UPDATE', 'enabled', fallback=False) else None
+            # 0 means one transform process per CPU
+            transform_workers = config.getint('PIPELINE', 'transform_workers', fallback=0) or None
+            queue_depth = config.getint('PIPELINE', 'queue_depth', fallback=4)
+            coordinate_checker = None
+            if config.getboolean('COORDS', 'validate', fallback=False):
+                # numpy (and shapely, for a boundary file) are only needed when validation is switched on
+                from coordinates import SiteCoordinateChecker, load_boundary, DEFAULT_TOLERANCE
+                boundary_file = config.get('COORDS', 'boundary_file', fallback='')
+                boundary = load_boundary(os.path.join(os.path.dirname(__file__), boundary_file)) if boundary_file else None
+                coordinate_checker = SiteCoordinateChecker(
+                    boundary, tolerance=config.getfloat('COORDS', 'tolerance_m', fallback=DEFAULT_TOLERANCE)
+                )
+            match_sites = config.getboolean('SITES', 'match', fallback=False)
+            assume_yes = args.yes or config.getboolean('RUN', 'non_interactive', fallback=False)
+            if config.getboolean('METRICS', 'enabled', fallback=False):
+                metrics = SqlMetrics()
+                enable_metrics(metrics)
+            interner = FeedInterner() if config.getboolean('DEDUP', 'enabled', fallback=False) else None
+            delta_state = None
+            if config.getboolean('DELTA', 'enabled', fallback=False):
+                delta_state = DeltaState(os.path.join(os.path.dirname(__file__), config.get('DELTA', 'state_file', fallback='delta_state.json')))
+
+            cache = None
+            if config.getboolean('CACHE', 'enabled', fallback=False):
+                cache_dir = config.get('CACHE', 'directory', fallback='feed_cache')
+                cache = FeedCache(
+                    os.path.join(os.path.dirname(__file__), cache_dir),
+                    max_bytes=config.getint('CACHE', 'max_size_mb', fallback=512) * 1024 * 1024,
+                    max_age=config.getint('CACHE', 'max_age_days', fallback=30) * 24 * 3600
+                )
+                cache.evict()
+
+            if not args.export and (args.resume or config.getboolean('JOURNAL', 'enabled', fallback=False)):
+                journal = RunJournal(os.path.join(os.path.dirname(__file__), config.get('JOURNAL', 'file', fallback='run_journal.jsonl')))
+                journal.start(args.resume)
+                if args.resume and cache is not None and cache.has_snapshot(api_url):
+                    # Resume from the snapshot the interrupted run was loading rather than downloading the feed again
+                    logging.info("Resuming from the cached feed snapshot.")
+                    use_local = True
 
         print(f"Step 2/{total_steps}: Verify API feed & database connection")
-        if input("Do you want to proceed? (yes/no): ").lower() == 'yes':
+        if not confirm("Do you want to proceed? (yes/no): ", assume_yes):
+            return 0
+        with report.stage('fetch_feed_and_connect') as stage:
             try:
-                json_data = connect_to_api(api_url, use_local)
+                json_data = connect_to_api(api_url, use_local, stream, cache, shard_urls, fetch_options)
+                # Only the fields step 5 writes are kept, in slotted FeedProject records
+                json_data = read_projects(json_data, with_digest=delta_state is not None, interner=interner)
+                if interner is not None:
+                    # Exact duplicate projects are dropped before any later stage sees them
+                    json_data = interner.dedupe(json_data)
+                    if not stream:
+                        json_data = list(json_data)
                 logging.info("Connected to API and fetched data.")
+                if delta_state is not None:
+                    # Only projects that are new or changed since the last successful run go on to steps 4 and 5
+                    json_data = delta_state.filter(json_data)
+                    if not stream:
+                        json_data = list(json_data)
+                        logging.info(f"Delta: {delta_state.new} new, {delta_state.changed} changed, {delta_state.unchanged} unchanged projects.")
+                if args.resume and journal.completed:
+                    # Batches committed before the interruption are skipped without another step-4 lookup
+                    json_data = journal.skip_completed(json_data)
+                    if not stream:
+                        json_data = list(json_data)
+                        logging.info(f"Resume: skipped {journal.skipped} projects committed by the interrupted run.")
+                if not stream:
+                    stage['records'] = len(json_data)
             except Exception as e:
                 logging.error(f"API connection failed: {e}")
-                return
+                stage['status'] = 'failed'
+                return 1
 
-            try:
-                username = config['DATABASE']['username']
-                password = config['DATABASE']['password']
-                host = config['DATABASE']['host']
-                port = config['DATABASE']['port']
-                sid = config['DATABASE']['sid']
-                print(f"Username: {username}, Password: XXXXX, Host: {host}, Port: {port}, SID: {sid}")
-                print(f"Connecting to database with host={host}, port={port}, sid={sid}")
-                dsn_str = f"(DESCRIPTION=(ADDRESS=(PROTOCOL=TCP)(HOST={host})(PORT={port}))(CONNECT_DATA=(SID={sid})))"
-                print(f"DSN String: {dsn_str}")
-                connection = oracledb.connect(user=username, password=password, dsn=dsn_str)
-                cursor = connection.cursor()
-                logging.info("Connected to the database.")
-            except oracledb.DatabaseError as e:
-                logging.error(f"Failed to connect to the database: {e}")
-                raise
-            except Exception as e:
-                logging.error(f"Database connection failed: {e}")
-                return
-        else:
-            return
+            if not args.export:
+                try:
+                    username = config['DATABASE']['username']
+                    password = config['DATABASE']['password']
+                    host = config['DATABASE']['host']
+                    port = config['DATABASE']['port']
+                    sid = config['DATABASE']['sid']
+                    print(f"Username: {username}, Password: XXXXX, Host: {host}, Port: {port}, SID: {sid}")
+                    print(f"Connecting to database with host={host}, port={port}, sid={sid}")
+                    dsn_str = f"(DESCRIPTION=(ADDRESS=(PROTOCOL=TCP)(HOST={host})(PORT={port}))(CONNECT_DATA=(SID={sid})))"
+                    print(f"DSN String: {dsn_str}")
+                    connection = oracledb.connect(user=username, password=password, dsn=dsn_str)
+                    if metrics is not None:
+                        connection = InstrumentedConnection(connection, metrics)
+                    cursor = connection.cursor()
+                    logging.info("Connected to the database.")
+                except oracledb.DatabaseError as e:
+                    logging.error(f"Failed to connect to the database: {e}")
+                    raise
+                except Exception as e:
+                    logging.error(f"Database connection failed: {e}")
+                    stage['status'] = 'failed'
+                    return 1
+
+        if args.export:
+            # Steps 3 to 5 run later from the bundle, against whichever database it is loaded into
+            print(f"Export: write the load bundle to {args.export}")
+            with report.stage('export_load_bundle') as stage:
+                try:
+                    stage['records'] = export_load_bundle(
+                        json_data, os.path.join(os.path.dirname(__file__), args.export), batch_size, coordinate_checker
+                    )
+                except Exception as e:
+                    logging.error(f"Failed to export the load bundle: {e}")
+                    stage['status'] = 'failed'
+                    return 1
+            logging.info("Process completed.")
+            return 0
 
         print(f"Step 3/{total_steps}: Insert source and series if not exists")
-        if input("Do you want to proceed? (yes/no): ").lower() == 'yes':
-             try:
-                 source_id, series_id, series_name_id = insert_source_and_series(cursor, connection)
-             except Exception as e:
-                 logging.error(f"Failed to insert or locate source and series (including series_names): {e}")
-                 return
+        if confirm("Do you want to proceed? (yes/no): ", assume_yes):
+            with report.stage('insert_source_and_series') as stage:
+                try:
+                    source_id, series_id, series_name_id = insert_source_and_series(cursor, connection)
+                except Exception as e:
+                    logging.error(f"Failed to insert or locate source and series (including series_names): {e}")
+                    stage['status'] = 'failed'
+                    return 1
 
         print(f"Step 4/{total_steps}: Check for existing projects and remove from JSON")
-        if input("Do you want to proceed? (yes/no): ").lower() == 'yes':
+        if not confirm("Do you want to proceed? (yes/no): ", assume_yes):
+            return 0
+        with report.stage('check_existing_projects') as stage:
             try:
-                project_ids_in_db = get_project_ids_from_db(cursor)
-
-                # Access oasisProjDetails directly as a dictionary
-                try:
-                    print(json_data['oasisProjDetails'])
-                    project_reference = json_data['oasisProjDetails']['projReference']
-                    print(f"Project Reference: {project_reference}")
-                except KeyError as e:
-                    logging.error(f"KeyError accessing 'projReference': {e}")
-                    return
-
-                # Create a set with the single project reference
-                json_project_ids = {project_reference}
+                if stream:
+                    # The feed has not been read yet, so known projects are looked up and dropped chunk by chunk as they stream past
+                    lookup = {'seconds': 0.0, 'records': 0}
+                    json_data = skip_existing_projects(cursor, json_data, existing_projects=existing_projects, timing=lookup)
+                    report.defer(stage, lookup, 'load_projects')
+                    logging.info("Matching projects will be skipped while streaming the feed.")
+                else:
+                    stage['records'] = len(json_data)
+                    json_project_ids = {project.reference for project in json_data}
 
-                common_project_ids = project_ids_in_db.keys() & json_project_ids
-                logging.info(f"Found {len(common_project_ids)} matching projects in the database.")
+                    common_project_ids = get_project_ids_from_db(cursor, json_project_ids).keys()
+                    logging.info(f"Found {len(common_project_ids)} matching projects in the database.")
 
-                if common_project_ids:
-                    print(f"Found {len(common_project_ids)} matching projects. Do you want to proceed with removal from copy of JSON data source? (yes/no): ")
-                    if input().lower() == 'yes':
-                        # Remove the project from oasisProjDetails if it matches
-                        if project_reference in common_project_ids:
-                            json_data['oasisProjDetails'] = {}
-                            logging.info("Removed matching project from the JSON data.")
+                    if common_project_ids:
+                        print(f"Found {len(common_project_ids)} matching projects.")
+                        if confirm("Do you want to proceed with removal from copy of JSON data source? (yes/no): ", assume_yes):
+                            if existing_projects is not None:
+                                existing_projects.extend(
+                                    project for project in json_data
+                                    if project.reference in common_project_ids
+                                )
+                            json_data = [
+                                project for project in json_data
+                                if project.reference not in common_project_ids
+                            ]
+                            logging.info("Removed matching projects from the JSON data.")
+                        else:
+                            return 0
                     else:
-                        return
-                else:
-                    logging.info("No matching projects found.")
+                        logging.info("No matching projects found.")
             except Exception as e:
                 logging.error(f"Failed to check for existing projects: {e}")
-                return
-        else:
-            return
+                stage['status'] = 'failed'
+                return 1
+
+        person_cache = None
+        if author_cache == 'preload':
+            matcher = None
+            if fuzzy_match:
+                matcher = PersonMatcher(config.getfloat('AUTHORS', 'fuzzy_threshold', fallback=DEFAULT_SURNAME_THRESHOLD))
+            person_cache = PersonCache(matcher=matcher)
+            person_cache.preload(cursor)
+        elif author_cache == 'lazy':
+            person_cache = PersonCache(max_entries=config.getint('AUTHORS', 'cache_size', fallback=100000))
+
+        if match_sites:
+            # An empty report file name logs the matches only
+            report_file = config.get('SITES', 'report_file', fallback='')
+            site_index = SiteIndex(
+                config.getfloat('SITES', 'radius_m', fallback=DEFAULT_RADIUS),
+                os.path.join(os.path.dirname(__file__), report_file) if report_file else None
+            )
+            site_index.preload(cursor)
 
         print(f"Step 5/{total_steps}: Insert new projects, authors, issues, site codes, bibliographic URLs, and location data")
-        if input("Do you want to proceed? (yes/no): ").lower() == 'yes':
+        if not confirm("Do you want to proceed? (yes/no): ", assume_yes):
+            return 0
+        if delta_state is not None:
+            # Only the projects that reach the loader (or the update below) have their new hashes recorded
+            json_data = delta_state.loaded(json_data)
+        with report.stage('load_projects') as stage:
             try:
-                for project in json_data['oasisProjDetails']:
-                    project_id = insert_project(cursor, project['projReference'])
-                    authors_str = project['oasisProjBiblioList'][0]['oasisProjBiblioAuthsList']['name']
-                    parsed_authors = parse_authors(authors_str)
-                    author_ids = insert_authors(cursor, parsed_authors)
-                    issue_id = insert_issue(cursor, project, source_id, series_id)
-                    link_authors_to_issue(cursor, author_ids, issue_id)
-                    insert_sites_and_project_number(cursor, project, issue_id)
-                    insert_bibliographic_urls(cursor, project, issue_id)
-                    insert_location_data(cursor, project, issue_id)
+                if async_engine:
+                    project_count, row_count = asyncio.run(run_async_load(
+                        username, password, dsn_str, json_data, source_id, series_id,
+                        async_concurrency, async_batch_size, person_cache, coordinate_checker, metrics, journal, site_index
+                    ))
+                elif workers > 1:
+                    pool = oracledb.create_pool(user=username, password=password, dsn=dsn_str, min=1, max=workers + 2, increment=1)
+                    if metrics is not None:
+                        pool = InstrumentedPool(pool, metrics)
+                    try:
+                        project_count, row_count = parallel_load_projects(
+                            pool, json_data, source_id, series_id, workers, batch_size, shard_by, person_cache, coordinate_checker,
+                            journal, site_index
+                        )
+                    finally:
+                        pool.close()
+                elif staging:
+                    project_count, row_count = staging_load_projects(
+                        cursor, connection, json_data, source_id, series_id, staging_batch_size, person_cache, coordinate_checker,
+                        journal, site_index
+                    )
+                elif pipeline:
+                    project_count, row_count = pipelined_load_projects(
+                        cursor, connection, json_data, source_id, series_id, batch_size, person_cache, coordinate_checker, journal,
+                        transform_workers, queue_depth, site_index
+                    )
+                elif bulk:
+                    project_count, row_count = bulk_load_projects(
+                        cursor, connection, json_data, source_id, series_id, batch_size, person_cache, coordinate_checker, journal,
+                        site_index
+                    )
+                else:
+                    project_count = row_load_projects(
+                        cursor, connection, json_data, source_id, series_id, person_cache, journal, batch_size
+                    )
                 connection.commit()
+                if existing_projects:
+                    # Filled while the load consumed a streamed feed, so only complete at this point
+                    update_existing_projects(cursor, connection, existing_projects, batch_size, person_cache, coordinate_checker, delta_state)
+                stage['records'] = project_count
+                if metrics is not None:
+                    metrics.projects = project_count
                 logging.info("Inserted new projects, authors, issues, site codes, bibliographic URLs, and location data.")
+                if delta_state is not None:
+                    if args.resume:
+                        # Skipped above because the interrupted run had already loaded them
+                        delta_state.mark_loaded(journal.completed)
+                    delta_state.commit()
+                if journal is not None:
+                    journal.finish()
+                if coordinate_checker is not None:
+                    logging.info(
+                        f"Coordinates checked: {coordinate_checker.checked} sites, {coordinate_checker.outside} outside Wales, "
+                        f"{coordinate_checker.swapped} with easting/northing swapped, "
+                        f"{coordinate_checker.mismatched} with a grid reference that does not match the lon/lat."
+                    )
+                if person_cache is not None:
+                    logging.info(
+                        f"Person cache: {person_cache.hits} hits, {person_cache.misses} misses, "
+                        f"{person_cache.matched} near-duplicates matched, {person_cache.inserted} persons inserted."
+                    )
+                if site_index is not None:
+                    logging.info(
+                        f"Site matching: {site_index.checked} new points checked, {site_index.flagged} within "
+                        f"{site_index.radius:g} m of a point of another issue; {len(site_index)} points indexed."
+                    )
             except Exception as e:
                 logging.error(f"Failed to insert new projects, authors, issues, site codes, bibliographic URLs, and location data: {e}")
-                return
-        else:
-            return
+                stage['status'] = 'failed'
+                return 1
 
         logging.info("Process completed.")
+        return 0
 
     except Exception as e:
         logging.error(f"An error occurred: {e}")
+        return 1
     finally:
-        try:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
-        except NameError:
-            pass
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+        if journal is not None:
+            journal.close()
+        if site_index is not None:
+            site_index.close()
+        if metrics is not None:
+            metrics.write(
+                metrics_path(config, 'json_file', 'sql_metrics.json'),
+                metrics_path(config, 'prometheus_file', 'sql_metrics.prom')
+            )
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())